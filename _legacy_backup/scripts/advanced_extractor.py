@@ -1,121 +1,145 @@
 import os
-import json
-import fitz  # PyMuPDF
-from unstructured.partition.pdf import partition_pdf
+import argparse
 from collections import defaultdict
-import re
+
+import config
+from image_encoder import ImageEncoder
+from image_store import ImageStore, image_files
+from metrics import Metrics, add_arguments, from_args
+from normalize import slugify
+from parallel import default_workers
+from partition import iter_elements, require_unstructured
+from pdf_buffer import open_pdf
+from topic_builder import TopicBuilder, TopicWriter
+from topic_index import TopicIndex
 
 class AdvancedExtractor:
-    def __init__(self, book_dir, output_dir, assets_dir):
+    def __init__(self, book_dir, output_dir, assets_dir, metrics=None, workers=1, shard_timeout=120):
+        require_unstructured()
         self.book_dir = book_dir
         self.output_dir = output_dir
         self.assets_dir = assets_dir
+        # Page-range shards are partitioned in this many worker processes,
+        # each shard given `shard_timeout` seconds before PyMuPDF takes over
+        self.workers = workers
+        self.shard_timeout = shard_timeout
+        self.metrics = metrics or Metrics()
+        self.image_settings = ImageEncoder().settings
         os.makedirs(output_dir, exist_ok=True)
         os.makedirs(assets_dir, exist_ok=True)
 
-    def slugify(self, text):
-        text = text.lower().strip()
-        text = re.sub(r'[^\w\s-]', '', text)
-        text = re.sub(r'[\s_-]+', '-', text)
-        text = re.sub(r'^-+|-+$', '', text)
-        return text
-
     def extract_images(self, pdf_path, prefix):
-        """Extracts images from PDF and returns a mapping of page_num to image_path."""
-        doc = fitz.open(pdf_path)
+        """Extracts images from PDF and returns a mapping of page_num to image_paths.
+
+        Images are deduplicated and stored under content-addressed names,
+        so repeated logos and headers are decoded and written only once;
+        encoding (WebP, capped size, thumbnails) runs on a thread pool.
+        """
+        doc = open_pdf(pdf_path)
+        encoder = ImageEncoder()
+        images = ImageStore(doc, self.assets_dir, encoder)
         img_map = {}
         
-        for i in range(len(doc)):
-            page = doc.load_page(i)
-            images = page.get_images(full=True)
-            for j, img in enumerate(images):
-                xref = img[0]
-                pix = fitz.Pixmap(doc, xref)
-                if pix.n - pix.alpha < 4:       # Smask or RGB
-                    pix.save(os.path.join(self.assets_dir, f"{prefix}_p{i}_i{j}.png"))
-                else:                           # CMYK: convert to RGB first
-                    pix1 = fitz.Pixmap(fitz.csRGB, pix)
-                    pix1.save(os.path.join(self.assets_dir, f"{prefix}_p{i}_i{j}.png"))
-                    pix1 = None
-                pix = None
-                img_map[i] = f"/src/assets/generated_images/{prefix}_p{i}_i{j}.png"
+        try:
+            for i in range(len(doc)):
+                page_imgs = images.page_images(doc.load_page(i))
+                if page_imgs:
+                    img_map[i] = page_imgs
+            self.metrics.count("pages", len(doc))
+        finally:
+            stats = encoder.close()
+            doc.close()
+        print(f"   Images for {prefix}: {images.decoded} decoded, {images.reused} reused")
+        self.metrics.count("images_decoded", images.decoded)
+        self.metrics.count("images_reused", images.reused)
+        self.metrics.count("image_bytes", stats["written_bytes"] + stats["thumb_bytes"])
         return img_map
 
     def process_pdf(self, filename):
+        """Converts one book; returns (index_entries, output_paths)."""
+        with self.metrics.stage("book", book=filename):
+            return self._process_pdf(filename)
+
+    def _process_pdf(self, filename):
         pdf_path = os.path.join(self.book_dir, filename)
-        prefix = self.slugify(filename.replace('.pdf', ''))
+        prefix = slugify(filename.replace('.pdf', ''))
         
         print(f"--- STARTING EXTRACTION: {filename} ---")
         
         # 1. Image Extraction
-        img_map = self.extract_images(pdf_path, prefix)
+        with self.metrics.stage("image_extraction", book=prefix):
+            img_map = self.extract_images(pdf_path, prefix)
         
-        # 2. Layout Partitioning
-        # Using partition_pdf (this might be slow on large files)
-        try:
-            elements = partition_pdf(filename=pdf_path, strategy="fast")
-        except Exception as e:
-            print(f"Unstructured Error: {e}. Falling back to simple extraction.")
-            # Fallback logic could go here, but let's assume it works for now
-            return
+        # 2. Layout Partitioning, streamed shard by shard into the segmenter
+        with open_pdf(pdf_path) as doc:
+            page_count = len(doc)
+        elements = iter_elements(pdf_path, page_count, self.workers, self.shard_timeout, self.metrics)
 
-        # 3. Topic Segmentation
-        tutorials = []
-        current_topic = {
+        # 3. Topic Segmentation (topics are saved as soon as they close)
+        writer = TopicWriter(self.output_dir, log=True)
+        builder = TopicBuilder(writer)
+        builder.start({
             "title": filename.replace('.pdf', ''),
             "description": f"Notes extracted from {filename}",
             "tags": ["extracted", prefix],
             "content": "",
             "slug": prefix
-        }
+        })
         
-        for el in elements:
-            text = str(el).strip()
-            etype = el.category # 'Title', 'NarrativeText', 'ListItem', etc.
-            
-            if etype == "Title" and len(text) > 3:
-                # If we have content in previous topic, save it
-                if current_topic["content"].strip():
-                    tutorials.append(current_topic)
-                    
-                # Start new topic
-                topic_title = text
-                current_topic = {
-                    "title": topic_title,
-                    "slug": self.slugify(f"{prefix}-{topic_title}"),
-                    "description": f"Module: {topic_title}",
-                    "tags": [prefix, "topic"],
-                    "content": f"# {topic_title}\n\n"
-                }
-            else:
-                # Add content
-                if etype == "ListItem":
-                    current_topic["content"] += f"- {text}\n"
-                elif etype == "NarrativeText":
-                    current_topic["content"] += f"{text}\n\n"
-                else:
-                    current_topic["content"] += f"{text}\n\n"
+        with self.metrics.stage("partition", book=prefix):
+            for etype, text in elements:
+                # etype: 'Title', 'NarrativeText', 'ListItem', etc.
+                self.add_element(builder, prefix, etype, text)
 
         # Final append
-        if current_topic["content"].strip():
-            tutorials.append(current_topic)
+        builder.close()
+        self.metrics.count("topics", len(writer.entries))
+        self.metrics.count("json_bytes", writer.bytes)
+        return writer.entries, image_files(img_map, self.assets_dir, thumbnails=bool(self.image_settings["thumb_side"])) + writer.paths
 
-        # 4. Save Tutorials
-        for t in tutorials:
-            out_file = os.path.join(self.output_dir, f"{t['slug']}.json")
-            with open(out_file, 'w', encoding='utf-8') as f:
-                json.dump(t, f, indent=2)
-            print(f"   Saved: {t['title']} -> {out_file}")
+    def add_element(self, builder, prefix, etype, text):
+        """Feeds one partitioned element into the topic builder."""
+        if etype == "Title" and len(text) > 3:
+            # Start new topic (the previous one is saved if it has content)
+            topic_title = text
+            builder.start({
+                "title": topic_title,
+                "slug": slugify(f"{prefix}-{topic_title}"),
+                "description": f"Module: {topic_title}",
+                "tags": [prefix, "topic"],
+                "content": f"# {topic_title}\n\n"
+            })
+        # Add content
+        elif etype == "ListItem":
+            builder.write(f"- {text}\n")
+        else:
+            builder.write(f"{text}\n\n")
 
     def run(self):
-        files = [f for f in os.listdir(self.book_dir) if f.lower().endswith('.pdf')]
+        files = config.discover_books(self.book_dir)
+        # Books go one at a time; each one's page shards share the workers
+        index = TopicIndex(self.output_dir)
         for f in files:
-            self.process_pdf(f)
+            entries, _ = self.process_pdf(f)
+            index.replace_book(f, entries)
+            index.save()
+        index.save()
+        self.metrics.summary()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Segment PDF books with unstructured.")
+    parser.add_argument("--workers", type=int, default=1, help=f"worker processes partitioning page shards (this machine: {default_workers()})")
+    parser.add_argument("--shard-timeout", type=float, default=120, help="seconds a page shard may take before PyMuPDF blocks replace it")
+    add_arguments(parser)
+    args = parser.parse_args()
+
     BOOK_DIR = "src/assets/book"
     OUTPUT_DIR = "src/data/generated_tutorials"
     ASSETS_DIR = "src/assets/generated_images"
     
-    extractor = AdvancedExtractor(BOOK_DIR, OUTPUT_DIR, ASSETS_DIR)
-    extractor.run()
+    extractor = AdvancedExtractor(BOOK_DIR, OUTPUT_DIR, ASSETS_DIR, metrics=from_args(args),
+                                  workers=args.workers, shard_timeout=args.shard_timeout)
+    try:
+        extractor.run()
+    finally:
+        extractor.metrics.close()
@@ -0,0 +1,78 @@
+import os
+import random
+
+import fitz  # PyMuPDF
+
+DEFAULT_SIZES = (10, 100, 1000)
+
+WORDS = ("data value function loop variable string list program memory compiler pointer "
+         "array structure module object class method return input output file error "
+         "statement expression operator condition branch index key table record").split()
+
+
+def _sentence(rng):
+    words = rng.choices(WORDS, k=rng.randint(8, 18))
+    return " ".join(words).capitalize() + "."
+
+
+def _pixmap(rng, colorspace, size):
+    """A noisy gradient image, so encoders have real work to do."""
+    n = colorspace.n
+    base = [rng.randrange(256) for _ in range(n)]
+    samples = bytearray()
+    for y in range(size):
+        for x in range(size):
+            for c in range(n):
+                samples.append((base[c] + x * (c + 1) + y * (n - c) + rng.randrange(16)) & 0xFF)
+    return fitz.Pixmap(colorspace, size, size, bytes(samples), False)
+
+
+def make_book(path, pages, seed=0, chapter_every=12, image_every=5, cmyk_every=4):
+    """Writes a synthetic textbook of `pages` pages to `path`.
+
+    Every page carries a running header (book title) and footer (page
+    number); a chapter heading (24pt) opens every `chapter_every` pages,
+    with 16pt section headings and 10pt body text between them. Every
+    `image_every` pages gets an image: every `cmyk_every`-th of those is
+    CMYK, and a logo repeats on each chapter opener to exercise dedupe.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    logo = _pixmap(rng, fitz.csRGB, 48)
+    images = 0
+    for i in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 40), "SYNTHETIC BENCHMARK BOOK", fontsize=9)
+        page.insert_text((500, 810), f"Page {i + 1}", fontsize=9)
+        y = 90
+        if i % chapter_every == 0:
+            page.insert_text((72, y), f"Chapter {i // chapter_every + 1}: Topic {rng.choice(WORDS).title()}", fontsize=24)
+            page.insert_image(fitz.Rect(480, 60, 528, 108), pixmap=logo)
+            y += 40
+        if i % image_every == 2:
+            images += 1
+            cs = fitz.csCMYK if images % cmyk_every == 0 else fitz.csRGB
+            page.insert_image(fitz.Rect(72, y, 272, y + 200), pixmap=_pixmap(rng, cs, 160))
+            y += 215
+        while y < 760:
+            if rng.random() < 0.12:
+                page.insert_text((72, y), f"{i // chapter_every + 1}.{rng.randint(1, 9)} {rng.choice(WORDS).title()} basics", fontsize=16)
+                y += 26
+            box = fitz.Rect(72, y, 523, y + 70)
+            page.insert_textbox(box, " ".join(_sentence(rng) for _ in range(4)), fontsize=10)
+            y += 78
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def corpus(directory, sizes=DEFAULT_SIZES):
+    """Paths of the synthetic books (one per page count), generating missing ones."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for pages in sizes:
+        path = os.path.join(directory, f"synthetic-{pages}.pdf")
+        if not os.path.exists(path):
+            print(f"Generating {path}...")
+            make_book(path, pages, seed=pages)
+        paths.append(path)
+    return paths
@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from bench_corpus import DEFAULT_SIZES, corpus
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '.cache', 'benchmarks')
+EXTRACTORS = ("elite", "advanced", "llm-prep")
+# Entry points whose start-up cost every run pays
+IMPORT_MODULES = ("pipeline", "elite_pdf_extractor", "advanced_extractor", "process_pdf",
+                  "pro_process_pdf", "text_extract", "topic_index")
+
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class Stages:
+    """Wall-clock seconds per named stage, in the order they ran."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def time(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.seconds[name] = round(self.seconds.get(name, 0.0) + time.perf_counter() - start, 4)
+        return result
+
+
+def bench_elite(pdf_path, work_dir):
+    """Elite stages timed one at a time, then an end-to-end process_pdf."""
+    from elite_pdf_extractor import ElitePDFExtractor
+    from image_encoder import ImageEncoder
+    from image_store import ImageStore
+    from normalize import find_running_lines
+    from page_cache import compact_page
+    from topic_builder import TopicBuilder, TopicWriter
+
+    book_dir, filename = os.path.split(pdf_path)
+    out_dir, assets_dir = os.path.join(work_dir, "out"), os.path.join(work_dir, "img")
+    extractor = ElitePDFExtractor(book_dir, out_dir, assets_dir, sample_fonts=False)
+    stages = Stages()
+    with fitz.open(pdf_path) as doc:
+        size_counts = Counter()
+        pages = stages.time("text_scan", lambda: [compact_page(p, size_counts) for p in doc])
+        thresholds = stages.time("font_analysis", extractor.analyze_fonts, size_counts)
+        running = stages.time("header_detection", find_running_lines, pages)
+
+        def extract_images():
+            encoder = ImageEncoder(**extractor.image_options)
+            store = ImageStore(doc, assets_dir, encoder)
+            img_map = {}
+            for i, page in enumerate(doc):
+                imgs = store.page_images(page)
+                if imgs:
+                    img_map[i] = imgs
+            encoder.close()
+            return img_map
+
+        img_map = stages.time("image_extraction", extract_images)
+
+    topics = []
+    prefix = os.path.splitext(filename)[0]
+    builder = TopicBuilder(topics.append, min_chars=100)
+    stages.time("segmentation", extractor.segment, filename, prefix, pages, img_map, thresholds, builder, running)
+    writer = TopicWriter(out_dir)
+    stages.time("json_write", lambda: [writer(t) for t in topics])
+
+    shutil.rmtree(out_dir)
+    shutil.rmtree(assets_dir)
+    os.makedirs(out_dir)
+    os.makedirs(assets_dir)
+    stages.time("end_to_end", extractor.process_pdf, filename)
+    return stages.seconds, [out_dir, assets_dir]
+
+
+def bench_advanced(pdf_path, work_dir):
+    from advanced_extractor import AdvancedExtractor
+
+    book_dir, filename = os.path.split(pdf_path)
+    out_dir, assets_dir = os.path.join(work_dir, "out"), os.path.join(work_dir, "img")
+    # Raises ImportError without unstructured, so the case is skipped rather
+    # than timing the PyMuPDF fallback under the "advanced" name
+    extractor = AdvancedExtractor(book_dir, out_dir, assets_dir)
+    stages = Stages()
+    stages.time("image_extraction", extractor.extract_images, pdf_path, "bench")
+    shutil.rmtree(assets_dir)
+    os.makedirs(assets_dir)
+    stages.time("end_to_end", extractor.process_pdf, filename)
+    return stages.seconds, [out_dir, assets_dir]
+
+
+def bench_llm_prep(pdf_path, work_dir):
+    """The local half of process_pdf.py / pro_process_pdf.py: text extraction
+    and chunking. Model calls are not benchmarked."""
+    from chunking import chunk_sections, split_sections
+    from text_extract import extract_text
+
+    stages = Stages()
+    text = stages.time("text_extraction", extract_text, pdf_path)
+    stages.time("block_extraction", extract_text, pdf_path, mode="blocks", separator="\n\n")
+    sections = stages.time("section_split", split_sections, text, "Introduction")
+    chunks = stages.time("chunking", chunk_sections, sections)
+    out_path = os.path.join(work_dir, "chunks.json")
+    with open(out_path, 'w', encoding='utf-8') as f:
+        stages.time("json_write", json.dump, chunks, f)
+    return stages.seconds, [work_dir]
+
+
+BENCHES = {"elite": bench_elite, "advanced": bench_advanced, "llm-prep": bench_llm_prep}
+
+
+def run_case(extractor, pdf_path):
+    """One benchmark case; runs in a fresh process so peak RSS is its own."""
+    with fitz.open(pdf_path) as doc:
+        pages = len(doc)
+    work_dir = tempfile.mkdtemp(prefix="bench-")
+    try:
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')  # the extractors print progress per page range
+        try:
+            stages, outputs = BENCHES[extractor](pdf_path, work_dir)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        total = stages.get("end_to_end") or sum(stages.values())
+        return {
+            "extractor": extractor,
+            "book": os.path.basename(pdf_path),
+            "pages": pages,
+            "stages": stages,
+            "seconds": round(total, 4),
+            "pages_per_sec": round(pages / total, 1) if total else None,
+            "peak_rss_mb": _peak_rss_mb(),
+            "output_bytes": sum(_dir_bytes(p) for p in outputs),
+        }
+    except ImportError as e:
+        return {"extractor": extractor, "book": os.path.basename(pdf_path), "pages": pages,
+                "skipped": f"missing dependency: {e.name or e}"}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _heaviest_imports(importtime_log, module, top=3):
+    """The `top` direct imports of `module` by cumulative ms, from a -X importtime log."""
+    children = []
+    for line in importtime_log.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2]
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == module:
+                break
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), round(int(parts[1]) / 1000, 1)))
+    return sorted(children, key=lambda c: c[1], reverse=True)[:top]
+
+
+def import_time(module, repeats=3):
+    """Best-of-`repeats` seconds to import one script in a fresh interpreter,
+    with its heaviest direct imports. Timings include -X importtime's own
+    small overhead."""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    best = None
+    for _ in range(repeats):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True)
+        if proc.returncode:
+            return {"module": module, "skipped": proc.stderr.strip().splitlines()[-1]}
+        seconds = float(proc.stdout.split()[-1])
+        if best is None or seconds < best["seconds"]:
+            best = {"module": module, "seconds": round(seconds, 4),
+                    "heaviest": _heaviest_imports(proc.stderr, module)}
+    return best
+
+
+def compare(results, baseline, imports=()):
+    """Prints the change in seconds per (extractor, book) and per imported
+    script against a previous run."""
+    old = {(r["extractor"], r["book"]): r for r in baseline["results"] if "seconds" in r}
+    for r in results:
+        prev = old.get((r["extractor"], r["book"]))
+        if prev and "seconds" in r:
+            change = (r["seconds"] - prev["seconds"]) / prev["seconds"] * 100 if prev["seconds"] else 0.0
+            print(f"  {r['extractor']:<10} {r['book']:<22} {prev['seconds']:>8.2f}s -> {r['seconds']:>8.2f}s ({change:+.1f}%)")
+    old = {r["module"]: r for r in baseline.get("imports", []) if "seconds" in r}
+    for r in imports:
+        prev = old.get(r["module"])
+        if prev and "seconds" in r:
+            print(f"  import {r['module']:<26} {prev['seconds'] * 1000:>8.1f}ms -> {r['seconds'] * 1000:>8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the extraction scripts on a synthetic PDF corpus.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="page counts of the synthetic books")
+    parser.add_argument("--extractors", nargs="+", choices=EXTRACTORS, default=list(EXTRACTORS))
+    parser.add_argument("--corpus-dir", default=os.path.join(CACHE_DIR, "corpus"), help="where synthetic books are generated and reused")
+    parser.add_argument("--output", help="results file (default: a timestamped file in the benchmark cache)")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    parser.add_argument("--imports", nargs="*", default=list(IMPORT_MODULES), metavar="MODULE",
+                        help="scripts whose cold import time is measured (none with an empty list)")
+    parser.add_argument("--imports-only", action="store_true", help="only measure import times")
+    args = parser.parse_args()
+
+    imports = []
+    for module in args.imports:
+        r = import_time(module)
+        imports.append(r)
+        if "skipped" in r:
+            print(f"import {module:<26} skipped ({r['skipped']})")
+        else:
+            heaviest = ", ".join(f"{name} {ms}ms" for name, ms in r["heaviest"])
+            print(f"import {module:<26} {r['seconds'] * 1000:>8.1f}ms  ({heaviest})")
+
+    books = [] if args.imports_only else corpus(args.corpus_dir, args.sizes)
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for extractor in args.extractors if books else ():
+        for pdf_path in books:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                r = pool.submit(run_case, extractor, pdf_path).result()
+            results.append(r)
+            if "skipped" in r:
+                print(f"{extractor:<10} {r['book']:<22} skipped ({r['skipped']})")
+            else:
+                print(f"{extractor:<10} {r['book']:<22} {r['seconds']:>8.2f}s {r['pages_per_sec']:>8} pages/s "
+                      f"{r['peak_rss_mb']:>7} MB {r['output_bytes'] / 1024:>9.0f} KB")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "cpus": os.cpu_count(),
+        "results": results,
+        "imports": imports,
+    }
+    output = args.output or os.path.join(CACHE_DIR, f"results-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare}:")
+        compare(results, baseline, imports)
+
+
+if __name__ == "__main__":
+    main()
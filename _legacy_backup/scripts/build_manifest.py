@@ -0,0 +1,106 @@
+import os
+import json
+import hashlib
+
+MANIFEST_VERSION = 1
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in 1 MiB chunks."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def default_manifest_path(output_dir):
+    # Named after the output folder and kept beside it, not inside, so topic
+    # globs over the folder never pick it up and each folder has its own
+    return os.path.abspath(output_dir) + ".build-manifest.json"
+
+
+class BuildManifest:
+    """Tracks which outputs were built from which source PDF.
+
+    Each book entry stores the PDF's content hash, the extractor settings
+    used, the output files written and the page layout found: heading
+    thresholds and running header/footer lines (so a forced rebuild of the
+    same PDF with the same settings skips font analysis). A book whose hash and settings are unchanged (and whose
+    outputs still exist) can be skipped; outputs that a book no longer
+    produces, or that belonged to a removed book, are deleted unless another
+    book still claims them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.books = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.books = data.get("books", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable build manifest {path}: {e}")
+
+    def _rel(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, '/')
+
+    def _abs(self, rel):
+        return os.path.join(self.root, *rel.split('/'))
+
+    def is_current(self, book, digest, settings):
+        entry = self.books.get(book)
+        if not entry or entry.get("sha256") != digest or entry.get("settings") != settings:
+            return False
+        return all(os.path.exists(self._abs(p)) for p in entry.get("outputs", []))
+
+    def layout(self, book, digest, settings):
+        """(thresholds, running_lines) recorded for this exact PDF and settings, or None."""
+        entry = self.books.get(book)
+        if (entry and entry.get("sha256") == digest and entry.get("settings") == settings
+                and entry.get("thresholds") and "running" in entry):
+            return tuple(entry["thresholds"]), {tuple(key) for key in entry["running"]}
+        return None
+
+    def record(self, book, digest, settings, outputs, layout=None):
+        """Stores a fresh build of `book` and removes its stale outputs."""
+        old = set(self.books.get(book, {}).get("outputs", []))
+        new = sorted({self._rel(p) for p in outputs})
+        self.books[book] = {"sha256": digest, "settings": settings, "outputs": new}
+        if layout:
+            thresholds, running = layout
+            self.books[book]["thresholds"] = list(thresholds)
+            self.books[book]["running"] = sorted(running)
+        self._remove(old - set(new))
+
+    def prune(self, present_books):
+        """Drops books whose PDF is gone and deletes their outputs."""
+        removed = [b for b in self.books if b not in set(present_books)]
+        for book in removed:
+            print(f"Source removed, cleaning outputs of: {book}")
+            self._remove(set(self.books.pop(book).get("outputs", [])))
+        return removed
+
+    def discard(self, paths):
+        """Deletes files written this run that no book keeps (e.g. a replaced attempt)."""
+        self._remove({self._rel(p) for p in paths})
+
+    def _remove(self, rel_paths):
+        claimed = {p for entry in self.books.values() for p in entry.get("outputs", [])}
+        for rel in sorted(rel_paths - claimed):
+            try:
+                os.remove(self._abs(rel))
+                print(f"   Removed stale output: {rel}")
+            except FileNotFoundError:
+                pass
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_VERSION, "books": self.books}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
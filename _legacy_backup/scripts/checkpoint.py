@@ -0,0 +1,158 @@
+import os
+import glob
+import json
+import pickle
+
+from build_manifest import file_hash
+from normalize import slugify
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.dirname(__file__), '..', '.cache', 'checkpoints')
+CHECKPOINT_VERSION = 1
+
+
+def _replace(tmp, path, write):
+    """Runs write(f) on a temp file, syncs it and renames it over `path`."""
+    with open(tmp, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def write_json_atomic(path, data):
+    """Writes `data` so `path` holds the old or the new JSON, never a torn file."""
+    _replace(f"{path}.{os.getpid()}.tmp", path,
+             lambda f: f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')))
+
+
+class BookCheckpoint:
+    """Durable progress of one book in one converter, for --resume.
+
+    Tied to the PDF's content hash and the converter settings: progress
+    recorded under other ones is ignored and replaced on the next write.
+    Files under `root`, named after `kind` and the book:
+
+    - `.json`: a state snapshot (save/load), replaced atomically
+    - `.jsonl`: an append-only journal of converted API chunks and, once
+      every output is written, the book's entries; each line is synced as
+      it is written and a line torn by a crash is ignored
+    - `.<name>.pickle`: finished parts of the work such as page shards
+
+    clear() removes them all once the book is done.
+    """
+
+    def __init__(self, kind, book, digest, settings, root=DEFAULT_CHECKPOINT_DIR):
+        self.book = book
+        # Round-tripped so it compares equal to the copy read back from disk
+        self.key = json.loads(json.dumps({"version": CHECKPOINT_VERSION, "book": book,
+                                          "digest": digest, "settings": settings}))
+        self.base = os.path.join(root, f"{kind}-{slugify(book.replace('.pdf', ''))}")
+        self.state_path = f"{self.base}.json"
+        self.journal_path = f"{self.base}.jsonl"
+        self._journal = None
+        os.makedirs(root, exist_ok=True)
+
+    def load(self):
+        """The last saved state, or None."""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable checkpoint {self.state_path}: {e}")
+            return None
+        return data["state"] if data.get("key") == self.key else None
+
+    def save(self, state):
+        write_json_atomic(self.state_path, {"key": self.key, "state": state})
+
+    def load_part(self, name):
+        try:
+            with open(f"{self.base}.{name}.pickle", 'rb') as f:
+                key, value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError) as e:
+            print(f"Warning: ignoring unreadable checkpoint part {name}: {e}")
+            return None
+        return value if key == self.key else None
+
+    def save_part(self, name, value):
+        path = f"{self.base}.{name}.pickle"
+        _replace(f"{path}.{os.getpid()}.tmp", path,
+                 lambda f: pickle.dump((self.key, value), f, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _records(self):
+        """Journal records written under this checkpoint's key, up to any torn line."""
+        records = []
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for n, line in enumerate(f):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if n == 0:
+                        if record != {"key": self.key}:
+                            return []
+                        continue
+                    records.append(record)
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _append(self, record):
+        if self._journal is None:
+            # Start from the valid records only, dropping a torn tail or a stale key
+            lines = [{"key": self.key}] + self._records()
+            _replace(f"{self.journal_path}.{os.getpid()}.tmp", self.journal_path,
+                     lambda f: f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in lines).encode('utf-8')))
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def chunks(self):
+        """{chunk hash: result} of the chunks converted so far."""
+        return {r["chunk"]: r["result"] for r in self._records() if "chunk" in r}
+
+    def record_chunk(self, chunk_hash, result):
+        self._append({"chunk": chunk_hash, "result": result})
+
+    def finished(self):
+        """(entries, output_paths) if the book's outputs were all written, else None."""
+        for record in self._records():
+            if "done" in record:
+                return record["done"]["entries"], record["done"]["paths"]
+        return None
+
+    def finish(self, entries, paths):
+        self._append({"done": {"entries": entries, "paths": paths}})
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def clear(self):
+        self.close()
+        for path in glob.glob(glob.escape(self.base) + ".*"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def book_checkpoint(kind, pdf_path, settings, resume=False, digest=None, root=DEFAULT_CHECKPOINT_DIR):
+    """The BookCheckpoint of one PDF; without `resume`, earlier progress is discarded."""
+    checkpoint = BookCheckpoint(kind, os.path.basename(pdf_path), digest or file_hash(pdf_path), settings, root)
+    if not resume:
+        checkpoint.clear()
+    return checkpoint
+
+
+def add_resume_argument(parser):
+    """The --resume flag shared by the scripts."""
+    parser.add_argument("--resume", action="store_true",
+                        help="continue books from the checkpoints of an interrupted run instead of starting over")
@@ -0,0 +1,307 @@
+import os
+import re
+import asyncio
+import hashlib
+
+from llm_client import LLMError, estimate_tokens
+from normalize import slugify
+from topic_builder import TopicWriter
+from topic_index import TopicIndex
+
+# "Chapter 3" alone on a line (its title follows), or "Chapter 3. Functions".
+# Running page headers repeat the current chapter's number and are dropped.
+CHAPTER_RE = re.compile(r'^(?i:chapter|part|unit|module|lesson)\s+(\d+|[IVXLC]+)(?:$|(?:[.:\-]\s*|\s+)([A-Z0-9].*)$)')
+# "2.1" alone on a line (title follows), or "2.1 Assignment statements"
+SECTION_RE = re.compile(r'^(\d{1,2}(?:\.\d{1,2})+)\.?(?:\s+([A-Z].{1,80}))?$')
+MAX_TITLE_LEN = 80
+# Dot leaders and page numbers of table-of-contents entries
+LEADER_RE = re.compile(r'(?:\s*\.){3,}.*$')
+PARA_RE = re.compile(r'\n\s*\n|\n')
+
+
+def _next_title(lines, i):
+    """The first non-blank line after i, if it is short enough to be a title."""
+    for j in range(i + 1, min(i + 4, len(lines))):
+        candidate = lines[j].strip()
+        if candidate:
+            if len(candidate) <= MAX_TITLE_LEN and candidate[0].isalnum():
+                return candidate, j
+            return None, i
+    return None, i
+
+
+def split_sections(text, default_title):
+    """Splits book text on detected chapter and section headings.
+
+    Returns a list of {"chapter", "chapter_index", "heading", "text"}
+    sections in reading order. Text before the first chapter heading (or a
+    book without any) belongs to a chapter named `default_title`.
+    `chapter_index` counts chapter headings, so chapters that share a title
+    stay apart.
+    """
+    lines = text.splitlines()
+    sections = []
+    chapter, chapter_key, chapter_index = default_title, None, 0
+    heading, body = None, []
+
+    def flush():
+        if heading or any(l.strip() for l in body):
+            sections.append({"chapter": chapter, "chapter_index": chapter_index, "heading": heading,
+                             "text": "\n".join(body).strip()})
+
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        m = CHAPTER_RE.match(line) if len(line) <= MAX_TITLE_LEN else None
+        if m:
+            key = m.group(1).upper()
+            if key == chapter_key:
+                # Same chapter number again: a running page header, drop it
+                i += 1
+                continue
+            title, end = (m.group(2).strip(), i) if m.group(2) else _next_title(lines, i)
+            flush()
+            chapter, chapter_key = title or f"Chapter {key}", key
+            chapter_index += 1
+            heading, body = None, []
+            i = end + 1
+            continue
+        m = SECTION_RE.match(line)
+        if m:
+            title, end = (m.group(2), i) if m.group(2) else _next_title(lines, i)
+            if title:
+                flush()
+                heading, body = f"{m.group(1)} {LEADER_RE.sub('', title).strip()}", []
+                i = end + 1
+                continue
+        body.append(lines[i])
+        i += 1
+    flush()
+    return sections
+
+
+def _pieces(section, max_tokens):
+    """Section text as one piece, or split on paragraph/line boundaries if too big."""
+    text = section["text"]
+    if section["heading"]:
+        text = f"## {section['heading']}\n\n{text}"
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    pieces, current = [], []
+    for para in PARA_RE.split(text):
+        if current and estimate_tokens("\n".join(current + [para])) > max_tokens:
+            pieces.append("\n".join(current))
+            current = []
+        current.append(para)
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+def chunk_sections(sections, max_tokens=4000):
+    """Packs sections into token-budgeted chunks that never cross a chapter.
+
+    Each chunk is {"chapter", "chapter_index", "part", "parts", "text",
+    "hash"}; `hash` keys identical text so it is only converted once.
+    """
+    chunks = []
+    current, chapter, index = [], None, None
+
+    def flush():
+        if current:
+            text = "\n\n".join(current)
+            chunks.append({"chapter": chapter, "chapter_index": index, "text": text,
+                           "hash": hashlib.sha256(text.encode('utf-8')).hexdigest()})
+
+    for section in sections:
+        if section["chapter_index"] != index:
+            flush()
+            current, chapter, index = [], section["chapter"], section["chapter_index"]
+        for piece in _pieces(section, max_tokens):
+            if current and estimate_tokens("\n\n".join(current + [piece])) > max_tokens:
+                flush()
+                current = []
+            current.append(piece)
+    flush()
+
+    totals = {}
+    for c in chunks:
+        totals[c["chapter_index"]] = totals.get(c["chapter_index"], 0) + 1
+        c["part"] = totals[c["chapter_index"]]
+    for c in chunks:
+        c["parts"] = totals[c["chapter_index"]]
+    return chunks
+
+
+def chunk_context(chunk, book_title):
+    return (f"\nThis is part {chunk['part']} of {chunk['parts']} of the chapter "
+            f"\"{chunk['chapter']}\" from \"{book_title}\". Convert only this part.\n")
+
+
+async def map_chunks(chunks, convert, checkpoint=None):
+    """Runs `convert(chunk)` concurrently, once per distinct chunk text.
+
+    Returns results aligned with `chunks`; a failed chunk's result is None.
+    convert() may raise LLMError. With a BookCheckpoint, chunks converted
+    by an earlier run are taken from it, and every new result is recorded
+    as it arrives, except after a retryable error: such a chunk stays
+    pending (see pending_chunks) for the next run.
+    """
+    unique = {}
+    for c in chunks:
+        unique.setdefault(c["hash"], c)
+    if len(unique) < len(chunks):
+        print(f"   Reusing {len(chunks) - len(unique)} duplicate chunks")
+    done = checkpoint.chunks() if checkpoint is not None else {}
+    if done:
+        print(f"   Resuming: {sum(1 for h in unique if h in done)} of {len(unique)} chunks already converted")
+
+    async def run(c):
+        if c["hash"] in done:
+            return done[c["hash"]]
+        try:
+            result = await convert(c)
+        except LLMError as e:
+            if e.retryable:
+                return None
+            result = None
+        if checkpoint is not None:
+            checkpoint.record_chunk(c["hash"], result)
+        return result
+
+    results = await asyncio.gather(*(run(c) for c in unique.values()))
+    by_hash = dict(zip(unique, results))
+    return [by_hash[c["hash"]] for c in chunks]
+
+
+def pending_chunks(chunks, checkpoint):
+    """The chunks `checkpoint` holds no result for (their conversion must be retried)."""
+    done = checkpoint.chunks()
+    return [c for c in chunks if c["hash"] not in done]
+
+
+def reduce_chapters(book_slug, book_title, chunks, results, tags=None):
+    """Merges per-chunk results into one module per chapter plus a book index.
+
+    Each result is a tutorial dict ({"title", "description", "tags",
+    "content", ...}) or None. Returns the topics in reading order, the index
+    (slug = `book_slug`) first. Chapters are told apart by chunk
+    "chapter_index", not by title; a repeated title gets a numbered slug.
+    """
+    chapters = {}
+    failed = 0
+    for chunk, result in zip(chunks, results):
+        parts = chapters.setdefault(chunk["chapter_index"], (chunk["chapter"], []))[1]
+        if result and result.get("content"):
+            parts.append(result)
+        else:
+            failed += 1
+    if failed:
+        print(f"   {failed} of {len(chunks)} chunks failed to convert")
+
+    modules = []
+    slugs = set()
+    for chapter, parts in chapters.values():
+        if not parts:
+            continue
+        slug = base = slugify(f"{book_slug}-{chapter}")
+        n = 1
+        while slug in slugs:
+            n += 1
+            slug = f"{base}-{n}"
+        slugs.add(slug)
+        chapter_tags = list(tags or [])
+        for p in parts:
+            for tag in p.get("tags") or []:
+                if tag not in chapter_tags:
+                    chapter_tags.append(tag)
+        modules.append({
+            "title": chapter,
+            "slug": slug,
+            "description": parts[0].get("description") or f"{chapter} from {book_title}",
+            "tags": chapter_tags[:6],
+            "content": "\n\n".join(p["content"].strip() for p in parts),
+        })
+    if not modules:
+        return []
+
+    toc = "\n".join(f"{n}. [{m['title']}](/ai-tutorial/{m['slug']})" for n, m in enumerate(modules, 1))
+    index = {
+        "title": book_title,
+        "slug": book_slug,
+        "description": f"{len(modules)} modules covering {book_title}",
+        "tags": list(tags or []) or modules[0]["tags"][:3],
+        "content": f"# {book_title}\n\n{toc}\n",
+    }
+    return [index] + modules
+
+
+async def convert_book_text(book, text, convert, chunk_tokens, metrics, output_dir, checkpoint=None):
+    """Chunks one book's text, converts the chunks and writes its topics.
+
+    `convert(chunk, book_title)` returns a tutorial dict or None and may
+    raise LLMError (see map_chunks). Returns (index_entries, output_paths)
+    or None. With a BookCheckpoint, a book the interrupted run finished is
+    returned as it was, and a book with chunks still pending after
+    retryable API errors is not written, so a rerun with --resume can
+    finish it.
+    """
+    if checkpoint is not None and checkpoint.finished() is not None:
+        print(f"Already converted by the interrupted run: {book}")
+        metrics.count("books_resumed")
+        return checkpoint.finished()
+    if not text:
+        print(f"Skipping {book} due to extraction failure.")
+        metrics.count("books_failed")
+        return None
+
+    # Split the whole book along its headings into token-budgeted chunks,
+    # convert them concurrently and merge them back per chapter
+    book_title = book.replace('.pdf', '')
+    chunks = chunk_sections(split_sections(text, "Introduction"), chunk_tokens)
+    print(f"Extracted {len(text)} characters from {book} ({len(chunks)} chunks). Generating content...")
+    metrics.count("chunks", len(chunks))
+
+    async def run(chunk):
+        return await convert(chunk, book_title)
+
+    with metrics.stage("conversion", book=book):
+        results = await map_chunks(chunks, run, checkpoint)
+    if checkpoint is not None:
+        pending = pending_chunks(chunks, checkpoint)
+        if pending:
+            print(f"{len(pending)} of {len(chunks)} chunks of {book} are still pending after API errors; "
+                  f"rerun with --resume to finish the book")
+            metrics.count("chunks_pending", len(pending))
+            metrics.count("books_incomplete")
+            return None
+    metrics.count("chunks_failed", sum(1 for r in results if not r))
+    topics = reduce_chapters(slugify(book_title), book_title, chunks, results)
+    if not topics:
+        print(f"Failed to generate tutorial for {book}")
+        metrics.count("books_failed")
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    writer = TopicWriter(output_dir)
+    for topic in topics:
+        writer(topic)
+    metrics.count("topics", len(topics))
+    metrics.count("json_bytes", writer.bytes)
+    if checkpoint is not None:
+        checkpoint.finish(writer.entries, writer.paths)
+    print(f"SUCCESS! Generated {len(topics) - 1} modules + index for {book}")
+    return writer.entries, writer.paths
+
+
+def index_books(output_dir, books, results, checkpoints):
+    """Indexes the converted books (results from convert_book_text), then
+    clears their checkpoints: only the books still pending keep theirs."""
+    index = TopicIndex(output_dir)
+    for book, result in zip(books, results):
+        if result:
+            index.replace_book(book, result[0])
+    index.save()
+    for book, result in zip(books, results):
+        if result and book in checkpoints:
+            checkpoints[book].clear()
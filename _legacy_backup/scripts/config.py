@@ -0,0 +1,48 @@
+import os
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+ENV_PATH = os.path.join(ROOT, '.env')
+
+BOOK_DIR = os.path.join(ROOT, 'src', 'assets', 'book')
+OUTPUT_DIR = os.path.join(ROOT, 'src', 'data', 'generated_tutorials')
+ASSETS_DIR = os.path.join(ROOT, 'src', 'assets', 'generated_images')
+
+_loaded = set()
+
+
+def load_env(path=ENV_PATH):
+    """Loads KEY=value lines from a .env file into os.environ, once per path.
+
+    Parsed by hand (quotes stripped, BOM tolerated) rather than with
+    python-dotenv; a missing file is not an error.
+    """
+    if path in _loaded:
+        return
+    _loaded.add(path)
+    try:
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#') or '=' not in line:
+                    continue
+                key, value = line.split('=', 1)
+                os.environ[key.strip()] = value.strip().strip('"').strip("'")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Error reading .env: {e}")
+
+
+def gemini_key():
+    load_env()
+    return os.getenv("VITE_GEMINI_API_KEY")
+
+
+def hf_token():
+    load_env()
+    return os.getenv("HUGGINGFACE_TOKEN")
+
+
+def discover_books(book_dir=BOOK_DIR):
+    """PDF file names in `book_dir`, sorted."""
+    return sorted(f for f in os.listdir(book_dir) if f.lower().endswith('.pdf'))
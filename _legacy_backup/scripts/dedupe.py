@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import zlib
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+from search_index import tokens
+
+SIGNATURES_VERSION = 1
+# Words per shingle; topics with fewer shingles are too short to compare
+SHINGLE_WORDS = 5
+MIN_SHINGLES = 20
+# 16 bands of 8 rows: pairs at Jaccard 0.8 share a band with p > 0.99,
+# pairs at 0.5 with p < 0.07
+PERMUTATIONS = 128
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+SIMILARITY = 0.8
+SEED = 2024
+# Shingles hashed per NumPy step, bounding the (shingles x permutations) matrix
+CHUNK = 4096
+
+MERSENNE = (1 << 61) - 1
+_rng = np.random.default_rng(SEED)
+# a * x + b stays below 2**64 for 32-bit a, b and x, so uint64 never wraps
+_A = _rng.integers(1, 1 << 32, PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, PERMUTATIONS, dtype=np.uint64)
+
+
+def default_signatures_path(output_dir):
+    # Beside the build manifest, out of the frontend's generated_tutorials/*.json glob
+    return os.path.abspath(output_dir) + ".topic-signatures.json"
+
+
+def shingles(topic):
+    """crc32 hashes of the word 5-grams of a topic's title and content."""
+    words = tokens(f"{topic.get('title', '')}\n{topic.get('content', '')}")
+    grams = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    return np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash(hashes):
+    """MinHash signature (PERMUTATIONS uint64 values) of a set of shingle hashes."""
+    sig = np.full(PERMUTATIONS, MERSENNE, dtype=np.uint64)
+    for start in range(0, len(hashes), CHUNK):
+        x = hashes[start:start + CHUNK, None]
+        sig = np.minimum(sig, ((_A * x + _B) % MERSENNE).min(axis=0))
+    return sig
+
+
+class DuplicateIndex:
+    """Persisted MinHash signatures of every finished topic, for near-duplicate links.
+
+    Signatures are kept per slug with their book and word count, so adding
+    a book only shingles that book's topics; the rest of the corpus is
+    compared through the stored signatures. links() buckets all signatures
+    with LSH (BANDS bands of ROWS rows) and only checks pairs that share a
+    bucket, so the comparison grows with the corpus rather than with its
+    square. Topics whose estimated Jaccard similarity reaches SIMILARITY are
+    grouped; each group's longest topic is kept as the canonical one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.docs = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if (data.get("version") == SIGNATURES_VERSION and data.get("seed") == SEED
+                    and data.get("permutations") == PERMUTATIONS and data.get("shingle") == SHINGLE_WORDS):
+                self.docs = data.get("docs", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: rebuilding unreadable signature file {path}: {e}")
+
+    def drop_book(self, book):
+        book = book or ""
+        self.docs = {s: d for s, d in self.docs.items() if d["book"] != book}
+
+    def replace_book(self, book, topics):
+        """Re-signs one book from its full topic dicts (and takes over slugs it now owns)."""
+        book = book or ""
+        self.drop_book(book)
+        for topic in topics:
+            self.docs.pop(topic["slug"], None)
+            hashes = shingles(topic)
+            if len(hashes) < MIN_SHINGLES:
+                continue
+            self.docs[topic["slug"]] = {
+                "book": book,
+                "words": len(topic.get("content", "").split()),
+                "sig": minhash(hashes).tolist(),
+            }
+
+    def reset(self):
+        self.docs = {}
+
+    def pairs(self):
+        """(slug, slug, similarity) for every near-duplicate pair, via LSH buckets."""
+        slugs = sorted(self.docs)
+        if len(slugs) < 2:
+            return []
+        sigs = np.array([self.docs[s]["sig"] for s in slugs], dtype=np.uint64)
+        candidates = set()
+        for band in range(BANDS):
+            buckets = defaultdict(list)
+            for i, row in enumerate(sigs[:, band * ROWS:(band + 1) * ROWS]):
+                buckets[row.tobytes()].append(i)
+            for members in buckets.values():
+                candidates.update((i, j) for k, i in enumerate(members) for j in members[k + 1:])
+        found = []
+        for i, j in sorted(candidates):
+            similarity = float((sigs[i] == sigs[j]).mean())
+            if similarity >= SIMILARITY:
+                found.append((slugs[i], slugs[j], similarity))
+        return found
+
+    def links(self):
+        """{slug: canonical slug} for every topic that duplicates a longer one."""
+        parent = {}
+
+        def find(s):
+            while parent.get(s, s) != s:
+                s = parent[s]
+            return s
+
+        for a, b, _ in self.pairs():
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+        groups = defaultdict(list)
+        for s in parent:
+            groups[find(s)].append(s)
+        out = {}
+        for root, members in groups.items():
+            members = set(members) | {root}
+            canonical = min(members, key=lambda s: (-self.docs[s]["words"], s))
+            out.update({s: canonical for s in members if s != canonical})
+        return out
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"version": SIGNATURES_VERSION, "seed": SEED, "permutations": PERMUTATIONS,
+                       "shingle": SHINGLE_WORDS, "docs": self.docs},
+                      f, separators=(',', ':'), sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def rebuild(output_dir, entries, path=None):
+    """Signs every topic in `entries` (index entries with "book") from scratch."""
+    from topic_index import read_topics
+
+    index = DuplicateIndex(path or default_signatures_path(output_dir))
+    index.reset()
+    by_book = defaultdict(list)
+    for entry in entries:
+        by_book[entry.get("book") or ""].append(entry)
+    for book, book_entries in by_book.items():
+        index.replace_book(book, read_topics(output_dir, book_entries))
+    index.save()
+    return index
+
+
+if __name__ == "__main__":
+    OUTPUT_DIR = os.path.join("src", "data", "generated_tutorials")
+    parser = argparse.ArgumentParser(description="Find near-duplicate topics across the tutorial corpus.")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--signatures", help="signature file (default: beside the build manifest)")
+    args = parser.parse_args()
+
+    from topic_index import TopicIndex
+
+    entries = list(TopicIndex(args.output_dir, search=False, dedupe=False).entries.values())
+    # Unowned topics are grouped by slug prefix, as the search benchmark does
+    for e in entries:
+        e["book"] = e.get("book") or e["slug"].split("-")[0]
+    t0 = time.perf_counter()
+    index = rebuild(args.output_dir, entries, args.signatures)
+    signed = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    pairs = index.pairs()
+    links = index.links()
+    matched = time.perf_counter() - t0
+
+    for a, b, similarity in pairs:
+        print(f"{similarity:.2f}  {a:<50} {b}")
+    print(f"Signed {len(index.docs)} of {len(entries)} topics in {signed:.2f}s -> {index.path}")
+    print(f"{len(pairs)} near-duplicate pairs, {len(links)} topics linked to a canonical one, "
+          f"matched in {matched * 1000:.1f} ms")
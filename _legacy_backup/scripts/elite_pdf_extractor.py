@@ -1,178 +1,445 @@
 import os
-import json
-import fitz  # PyMuPDF
-import re
+import time
+import argparse
 from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import config
+from build_manifest import BuildManifest, default_manifest_path, file_hash
+from checkpoint import DEFAULT_CHECKPOINT_DIR, add_resume_argument, book_checkpoint
+from font_stats import detect_thresholds, heading_thresholds
+from normalize import clean_heading, find_running_lines, slugify, strip_running_lines
+from image_encoder import ImageEncoder
+from image_store import ImageStore, image_files
+from layout import CODE, H1, H2, H3, classify_pages
+from metrics import Metrics, add_arguments, from_args
+from page_cache import PageStore, compact_page
+from parallel import default_workers, page_shards
+from pdf_buffer import open_pdf, shared_document
+from topic_builder import TopicBuilder, TopicWriter
+from topic_index import TopicIndex
 
 class ElitePDFExtractor:
-    def __init__(self, book_dir, output_dir, assets_dir):
+    # Recorded in the build manifest; bump "version" whenever a change here
+    # alters the generated output so every book is rebuilt once.
+    SETTINGS = {"extractor": "elite", "version": 7}
+
+    def __init__(self, book_dir, output_dir, assets_dir, stream=False, manifest_path=None,
+                 image_format="webp", max_image_side=1600, thumb_side=320, sample_fonts=False, metrics=None,
+                 resume=False, checkpoint_dir=DEFAULT_CHECKPOINT_DIR,
+                 checkpoint_seconds=30):
         self.book_dir = book_dir
         self.output_dir = output_dir
         self.assets_dir = assets_dir
+        # Spill compact pages to disk instead of holding the whole book
+        self.stream = stream
+        self.manifest_path = manifest_path or default_manifest_path(output_dir)
+        # Estimate heading sizes from a page sample so long books segment in
+        # one pass; off by default, a sample can miss rare heading sizes
+        self.sample_fonts = sample_fonts
+        self.image_options = {"fmt": image_format, "max_side": max_image_side, "thumb_side": thumb_side}
+        self.settings = {**self.SETTINGS, "images": ImageEncoder(**self.image_options).settings,
+                         "sample_fonts": sample_fonts}
+        self.metrics = metrics or Metrics()
+        # Pick books up from the checkpoints an interrupted run left behind
+        self.resume = resume
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_seconds = checkpoint_seconds
         os.makedirs(output_dir, exist_ok=True)
         os.makedirs(assets_dir, exist_ok=True)
 
-    def slugify(self, text):
-        text = text.lower().strip()
-        text = re.sub(r'[^\w\s-]', '', text)
-        text = re.sub(r'[\s_-]+', '-', text)
-        text = re.sub(r'^-+|-+$', '', text)
-        return text
-
-    def analyze_fonts(self, doc):
-        """Analyzes font sizes to determine heading thresholds."""
-        font_sizes = []
-        for page in doc:
-            blocks = page.get_text("dict")["blocks"]
-            for b in blocks:
-                if "lines" in b:
-                    for l in b["lines"]:
-                        for s in l["spans"]:
-                            font_sizes.append(round(s["size"], 1))
-        
-        counts = Counter(font_sizes)
-        # The most common font size is likely the body text
-        common_sizes = sorted(counts.items(), key=lambda x: x[1], reverse=True)
-        body_size = common_sizes[0][0] if common_sizes else 10
-        
-        # Headings are usually larger than body text
-        headings = [size for size, count in common_sizes if size > body_size]
-        headings.sort(reverse=True)
-        
-        # Assign levels (rough heuristic)
-        h1_size = headings[0] if len(headings) > 0 else body_size + 4
-        h2_size = headings[1] if len(headings) > 1 else body_size + 2
-        h3_size = headings[2] if len(headings) > 2 else body_size + 1
-        
-        print(f"Font Analysis: Body({body_size}), H1({h1_size}), H2({h2_size}), H3({h3_size})")
-        return h1_size, h2_size, h3_size
-
-    def extract_images(self, doc, prefix):
-        """Extracts images and returns a map of {page_num: [image_paths]}."""
-        img_map = {}
-        print(f"Extracting images for {prefix}...")
-        for i in range(len(doc)):
-            page = doc.load_page(i)
-            images = page.get_images(full=True)
-            page_imgs = []
-            for j, img in enumerate(images):
-                xref = img[0]
-                pix = fitz.Pixmap(doc, xref)
-                
-                # Convert to RGB if it's CMYK or has other incompatible formats
-                if pix.n >= 4:
-                    pix = fitz.Pixmap(fitz.csRGB, pix)
-                
-                img_name = f"{prefix}_p{i}_i{j}.png"
-                img_path = os.path.join(self.assets_dir, img_name)
-                
-                try:
-                    pix.save(img_path)
-                    page_imgs.append(f"/src/assets/generated_images/{img_name}")
-                except Exception as e:
-                    print(f"Warning: Could not save image {img_name}: {e}")
-                
-                pix = None
-            if page_imgs:
-                img_map[i] = page_imgs
-        return img_map
-
-    def process_pdf(self, filename):
-        pdf_path = os.path.join(self.book_dir, filename)
-        prefix = self.slugify(filename.replace('.pdf', ''))
-        doc = fitz.open(pdf_path)
-        
-        h1_size, h2_size, h3_size = self.analyze_fonts(doc)
-        img_map = self.extract_images(doc, prefix)
-        
-        topics = []
-        current_topic = {
-            "title": filename.replace('.pdf', ''),
-            "slug": prefix,
-            "description": f"Notes from {filename}",
-            "tags": [prefix, "Premium"],
-            "content": "",
-            "createdAt": "2026-02-17"
-        }
-        
-        prev_titles = set()
+    def analyze_fonts(self, size_counts):
+        """Derives (body, h1, h2, h3) sizes from a {font_size: span_count} histogram."""
+        thresholds = heading_thresholds(size_counts)
+        print("Font Analysis: Body({}), H1({}), H2({}), H3({})".format(*thresholds))
+        return thresholds
+
+    def full_layout(self, size_counts, pages):
+        """(thresholds, running_lines) from the whole book's histogram and pages."""
+        return self.analyze_fonts(size_counts), find_running_lines(pages)
+
+    def sampled_layout(self, doc, prefix):
+        """(thresholds, running_lines) estimated from a page sample, or None
+        when sample_fonts is off or the sample is inconclusive. The serial and
+        the sharded path both start from it (or from full_layout), so a book
+        segments the same way with any number of workers."""
+        if not self.sample_fonts:
+            return None
+        sample = []
+        with self.metrics.stage("font_analysis", book=prefix):
+            thresholds = detect_thresholds(doc, records=sample)
+            if thresholds is None:
+                return None
+            print("Font Analysis (sampled): Body({}), H1({}), H2({}), H3({})".format(*thresholds))
+            # Running headers are spotted on the sample pages
+            return thresholds, find_running_lines(sample)
+
+    def iter_pages(self, doc, prefix, size_counts, img_map, start=0, stop=None, encoder=None):
+        """Single walk over pages [start, stop) of the document.
+
+        Yields each page's span dict in compact form (extracted once), while
+        the font histogram and the page-to-image map (content-addressed,
+        shared files) are filled in alongside; a page's images are in
+        `img_map` by the time the page is yielded. Images are written by
+        `encoder` (a fresh ImageEncoder by default), which is closed at the end.
+        """
+        stop = len(doc) if stop is None else stop
+        metrics = self.metrics
+        spans = sum(size_counts.values())
+        encoder = encoder or ImageEncoder(**self.image_options)
+        images = ImageStore(doc, self.assets_dir, encoder)
+        print(f"Scanning pages {start}-{stop - 1} of {prefix}...")
+        try:
+            for i in range(start, stop):
+                t0 = time.perf_counter()
+                page = doc.load_page(i)
+                record = compact_page(page, size_counts)
+                page_imgs = images.page_images(page)
+                if page_imgs:
+                    img_map[i] = page_imgs
+                metrics.observe("page", time.perf_counter() - t0, book=prefix, page=i)
+                yield record
+        finally:
+            with metrics.stage("image_flush", book=prefix):
+                stats = encoder.close()
+        print(f"Images for {prefix}: {images.decoded} decoded, {images.reused} reused")
+        metrics.count("pages", stop - start)
+        metrics.count("spans", sum(size_counts.values()) - spans)
+        metrics.count("images_decoded", images.decoded)
+        metrics.count("images_reused", images.reused)
+        metrics.count("image_bytes", stats["written_bytes"] + stats["thumb_bytes"])
+
+    def scan_pages(self, doc, prefix, store, start=0, stop=None):
+        """Appends pages [start, stop) to `store`; returns (size_counts, img_map)."""
+        size_counts, img_map = Counter(), {}
+        for record in self.iter_pages(doc, prefix, size_counts, img_map, start, stop):
+            store.append(record)
+        return size_counts, img_map
+
+    def scan_shard(self, filename, start, stop):
+        """Process-pool entry point: scans one page range.
+
+        The worker's document is kept open across the shards it is given,
+        so each worker parses the book's xref table once.
+        """
+        prefix = slugify(filename.replace('.pdf', ''))
+        doc = shared_document(os.path.join(self.book_dir, filename))
+        pages = []
+        with self.metrics.stage("scan_shard", book=prefix, start=start, stop=stop):
+            size_counts, img_map = self.scan_pages(doc, prefix, pages, start, stop)
+        return pages, size_counts, img_map, self.metrics.take()
+
+    def segment(self, filename, prefix, pages, img_map, thresholds, builder, running=(), start=0,
+                resume=None, on_page=None):
+        """Splits compact page records into topics on H1-sized lines.
+
+        Header/footer lines whose keys are in `running` are dropped first.
+        Lines are classified in page batches (layout.classify_pages);
+        runs of monospaced lines become fenced code blocks with their
+        indentation restored. Topics are streamed into `builder` (a
+        TopicBuilder) as they close.
+
+        `pages` start at page `start`. To continue an interrupted run, pass
+        the segmenter state its last checkpoint saved as `resume`; the open
+        topic is then taken from `builder`. `on_page(next_page, state)` is
+        called after every page with a function returning that state.
+        """
+        write = builder.write
+        if resume is None:
+            builder.start({
+                "title": filename.replace('.pdf', ''),
+                "slug": prefix,
+                "description": f"Notes from {filename}",
+                "tags": [prefix, "Premium"],
+                "content": "",
+                "createdAt": "2026-02-17"
+            })
+            prev_titles = set()
+            title_key = builder.meta["title"].lower()
+        else:
+            prev_titles = set(resume["prev_titles"])
+            title_key = resume["title_key"]
         print(f"Segmenting {filename} into topics...")
-        
-        for i, page in enumerate(doc):
-            blocks = page.get_text("dict")["blocks"]
+
+        def state():
+            return {"prev_titles": sorted(prev_titles), "title_key": title_key}
+
+        pages = classify_pages(strip_running_lines(pages, running), thresholds)
+        for i, (blocks, classes) in enumerate(pages, start):
             if i in img_map:
                 for img_path in img_map[i]:
-                    current_topic["content"] += f"\n![Image]({img_path})\n"
-
-            for b in blocks:
-                if "lines" in b:
-                    for l in b["lines"]:
-                        # Join spans to handle split titles
-                        line_text = "".join([s["text"] for s in l["spans"]]).strip()
-                        if not line_text: continue
-                        
-                        # Use the average size or max size for the line
-                        max_size = max([s["size"] for s in l["spans"]])
-                        size = round(max_size, 1)
+                    write(f"\n![Image]({img_path})\n")
+
+            classes = iter(classes)
+            in_code = False
+            for block in blocks:
+                for (_, line_text, _, _), (kind, indent) in zip(block, classes):
+                    if kind == CODE:
+                        if not in_code:
+                            write("\n```\n")
+                            in_code = True
+                        write(" " * indent + line_text + "\n")
+                        continue
+                    if in_code:
+                        write("```\n\n")
+                        in_code = False
+                    if kind == H1:
+                        # Clean the text (remove page numbers etc)
+                        clean_text = clean_heading(line_text)
+                        key = clean_text.lower()
                         
-                        if size >= h1_size and len(line_text) < 100:
-                            # Clean the text (remove page numbers etc)
-                            clean_text = re.sub(r'\s+Page\s+\d+\s*$', '', line_text, flags=re.IGNORECASE).strip()
-                            
-                            # Skip if it's the same as current title or a frequent header
-                            if clean_text.lower() in prev_titles or clean_text.lower() == current_topic["title"].lower():
-                                current_topic["content"] += f"\n# {line_text}\n"
-                                continue
-
-                            if current_topic["content"].strip():
-                                topics.append(current_topic)
-                            
-                            prev_titles.add(clean_text.lower())
-                            current_topic = {
-                                "title": clean_text,
-                                "slug": self.slugify(f"{prefix}-{clean_text}"),
-                                "description": f"Module from {filename}: {clean_text}",
-                                "tags": [prefix, "Elite"],
-                                "content": f"# {clean_text}\n\n",
-                                "createdAt": "2026-02-17"
-                            }
-                        elif size >= h2_size and len(line_text) < 100:
-                            current_topic["content"] += f"\n## {line_text}\n"
-                        elif size >= h3_size and len(line_text) < 100:
-                            current_topic["content"] += f"\n### {line_text}\n"
-                        else:
-                            current_topic["content"] += line_text + " "
-                    current_topic["content"] += "\n"
-                current_topic["content"] += "\n"
-
-        if current_topic["content"].strip():
-            topics.append(current_topic)
+                        # Skip if it's the same as current title or a frequent header
+                        if key in prev_titles or key == title_key:
+                            write(f"\n# {line_text}\n")
+                            continue
+
+                        prev_titles.add(key)
+                        title_key = key
+                        builder.start({
+                            "title": clean_text,
+                            "slug": slugify(f"{prefix}-{clean_text}"),
+                            "description": f"Module from {filename}: {clean_text}",
+                            "tags": [prefix, "Elite"],
+                            "content": f"# {clean_text}\n\n",
+                            "createdAt": "2026-02-17"
+                        })
+                    elif kind == H2:
+                        write(f"\n## {line_text}\n")
+                    elif kind == H3:
+                        write(f"\n### {line_text}\n")
+                    else:
+                        write(line_text + " ")
+                if not in_code:
+                    write("\n\n")
+            if in_code:
+                write("```\n\n")
+            if on_page is not None:
+                on_page(i + 1, state)
+
+        builder.close()
+
+    def checkpointer(self, checkpoint, encoder, writer, builder, img_map, thresholds, sampled, running):
+        """segment() on_page callback saving the book's progress to `checkpoint`
+        at most every checkpoint_seconds."""
+        last = time.perf_counter()
 
+        def on_page(next_page, segment_state):
+            nonlocal last
+            if time.perf_counter() - last < self.checkpoint_seconds:
+                return
+            # The checkpointed pages' images must be on disk before we say so
+            encoder.flush()
+            checkpoint.save({
+                "page": next_page,
+                "thresholds": list(thresholds),
+                "sampled": sampled,
+                "running": sorted(running),
+                "img_map": {str(p): imgs for p, imgs in img_map.items() if p < next_page},
+                "writer": writer.state(),
+                "topic": builder.snapshot(),
+                "segment": segment_state(),
+            })
+            self.metrics.count("checkpoints")
+            last = time.perf_counter()
+
+        return on_page
+
+    def process_pdf(self, filename, shards=None, layout=None, checkpoint=None):
+        """Segments one book and returns (index_entries, output_paths, layout).
+
+        `layout` is (thresholds, running_lines): the heading sizes and the
+        header/footer lines to drop. `shards` are scan_shard results (in
+        page order) from a parallel run; without them the book is scanned
+        here. When the layout is known up front (passed in from the build
+        manifest, or estimated from a page sample with sample_fonts)
+        segmentation runs during the scan itself, in one pass with flat
+        memory; otherwise the pages are kept until the full font histogram
+        is in. Topics are written to disk as soon as they close. The
+        returned layout is None when it was only estimated from a sample, so
+        the build manifest caches exact values only.
+
+        With a BookCheckpoint, the one-pass scan saves its progress (pages
+        done, topics written, the open topic) every checkpoint_seconds and
+        continues from the last save if one exists.
+        """
+        pdf_path = os.path.join(self.book_dir, filename)
+        prefix = slugify(filename.replace('.pdf', ''))
+        
         # Filter out empty/tiny topics (e.g. cover pages or repetitive headers)
         # Minimum 100 characters to be considered a valid tutorial module
-        final_topics = [t for t in topics if len(t["content"].strip()) > 100]
-        
-        # Save each topic as a JSON
-        for t in final_topics:
-            out_path = os.path.join(self.output_dir, f"{t['slug']}.json")
-            with open(out_path, 'w', encoding='utf-8') as f:
-                json.dump(t, f, indent=2)
-        
-        print(f"Total valid topics generated: {len(final_topics)}")
-        return final_topics
+        writer = TopicWriter(self.output_dir)
+        builder = TopicBuilder(writer, min_chars=100)
+        metrics = self.metrics
+        sampled = False
+        if shards is not None:
+            if layout is None:
+                with open_pdf(pdf_path) as doc:
+                    layout = self.sampled_layout(doc, prefix)
+                sampled = layout is not None
+            size_counts, img_map = Counter(), {}
+            pages = []
+            for records, counts, imgs, stats in shards:
+                pages.extend(records)
+                size_counts.update(counts)
+                img_map.update(imgs)
+                metrics.merge(stats)
+            with metrics.stage("font_analysis", book=prefix):
+                thresholds, running = layout or self.full_layout(size_counts, pages)
+            with metrics.stage("segmentation", book=prefix):
+                self.segment(filename, prefix, pages, img_map, thresholds, builder, running)
+        else:
+            saved = checkpoint.load() if checkpoint is not None else None
+            with open_pdf(pdf_path) as doc:
+                size_counts, img_map = Counter(), {}
+                if saved is not None:
+                    # Font analysis and the pages before the checkpoint are done
+                    print(f"Resuming {filename} at page {saved['page']} of {len(doc)}")
+                    thresholds, sampled = saved["thresholds"], saved["sampled"]
+                    running = {tuple(key) for key in saved["running"]}
+                    img_map.update((int(p), imgs) for p, imgs in saved["img_map"].items())
+                    writer.resume(saved["writer"])
+                    if saved["topic"] is not None:
+                        builder.start(saved["topic"])
+                    metrics.count("pages_resumed", saved["page"])
+                    layout = thresholds, running
+                elif layout is None:
+                    layout = self.sampled_layout(doc, prefix)
+                    sampled = layout is not None
+                if layout is not None:
+                    thresholds, running = layout
+                    start = saved["page"] if saved else 0
+                    encoder = ImageEncoder(**self.image_options)
+                    on_page = None
+                    if checkpoint is not None:
+                        on_page = self.checkpointer(checkpoint, encoder, writer, builder, img_map,
+                                                    thresholds, sampled, running)
+                    with metrics.stage("scan_segmentation", book=prefix):
+                        pages = self.iter_pages(doc, prefix, size_counts, img_map, start, encoder=encoder)
+                        self.segment(filename, prefix, pages, img_map, thresholds, builder, running, start,
+                                     resume=saved and saved["segment"], on_page=on_page)
+                else:
+                    store = PageStore(stream=self.stream)
+                    try:
+                        with metrics.stage("scan", book=prefix):
+                            for record in self.iter_pages(doc, prefix, size_counts, img_map):
+                                store.append(record)
+                        with metrics.stage("font_analysis", book=prefix):
+                            thresholds, running = self.full_layout(size_counts, store)
+                        with metrics.stage("segmentation", book=prefix):
+                            self.segment(filename, prefix, store, img_map, thresholds, builder, running)
+                    finally:
+                        store.close()
+
+        outputs = image_files(img_map, self.assets_dir, thumbnails=bool(self.settings["images"]["thumb_side"]))
+        print(f"Total valid topics generated: {len(writer.entries)}")
+        metrics.count("topics", len(writer.entries))
+        metrics.count("json_bytes", writer.bytes)
+        return writer.entries, outputs + writer.paths, None if sampled else (thresholds, running)
+
+    def book_checkpoint(self, filename, digest):
+        return book_checkpoint("elite", os.path.join(self.book_dir, filename), self.settings, self.resume,
+                               digest=digest, root=self.checkpoint_dir)
+
+    def run(self, workers=1, force=False):
+        files = config.discover_books(self.book_dir)
+        manifest = BuildManifest(self.manifest_path)
+        index = TopicIndex(self.output_dir)
+        for removed in manifest.prune(files):
+            index.drop_book(removed)
 
-    def run(self):
-        files = [f for f in os.listdir(self.book_dir) if f.lower().endswith('.pdf')]
+        # Skip books whose PDF and extractor settings are unchanged
+        todo = []
         for f in files:
-            print(f"\n--- PROCESSING: {f} ---")
-            self.process_pdf(f)
+            digest = file_hash(os.path.join(self.book_dir, f))
+            if not force and manifest.is_current(f, digest, self.settings):
+                print(f"Unchanged, skipping: {f}")
+                continue
+            todo.append((f, digest))
+
+        def finish(f, digest, result, checkpoint):
+            entries, outputs, layout = result
+            self.metrics.count("books")
+            index.replace_book(f, entries)
+            index.save()
+            manifest.record(f, digest, self.settings, outputs, layout)
+            manifest.save()
+            # Recorded in the manifest: the next run skips the book altogether
+            checkpoint.clear()
+
+        if workers <= 1:
+            for f, digest in todo:
+                print(f"\n--- PROCESSING: {f} ---")
+                checkpoint = self.book_checkpoint(f, digest)
+                with self.metrics.stage("book", book=f):
+                    result = self.process_pdf(f, layout=manifest.layout(f, digest, self.settings), checkpoint=checkpoint)
+                finish(f, digest, result, checkpoint)
+            index.save()
+            manifest.save()
+            self.metrics.count("books_skipped", len(files) - len(todo))
+            self.metrics.summary()
+            return
+
+        # Queue page-range shards of every book up front so large books keep
+        # all workers busy; each book is then segmented in order as its
+        # shards come back. Finished shards are checkpointed as they arrive,
+        # so a resumed run only rescans the ones it had not got back.
+        def keep(checkpoint, name, future):
+            if future.exception() is None:
+                checkpoint.save_part(name, future.result())
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for f, digest in todo:
+                checkpoint = self.book_checkpoint(f, digest)
+                with open_pdf(os.path.join(self.book_dir, f)) as doc:
+                    page_count = len(doc)
+                futures = []
+                for start, stop in page_shards(page_count, workers):
+                    name = f"shard-{start}-{stop}"
+                    done = checkpoint.load_part(name)
+                    if done is not None:
+                        future = Future()
+                        future.set_result(done)
+                        self.metrics.count("shards_resumed")
+                    else:
+                        future = pool.submit(self.scan_shard, f, start, stop)
+                        future.add_done_callback(lambda fut, c=checkpoint, n=name: keep(c, n, fut))
+                    futures.append(future)
+                pending.append((f, digest, futures, checkpoint))
+            for f, digest, futures, checkpoint in pending:
+                print(f"\n--- PROCESSING: {f} ---")
+                with self.metrics.stage("book", book=f):
+                    result = self.process_pdf(f, shards=[fut.result() for fut in futures],
+                                              layout=manifest.layout(f, digest, self.settings))
+                finish(f, digest, result, checkpoint)
+        index.save()
+        manifest.save()
+        self.metrics.count("books_skipped", len(files) - len(todo))
+        self.metrics.summary()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Segment PDF books into tutorial modules.")
+    parser.add_argument("--stream", action="store_true", help="spill page data to disk to bound memory on very large books")
+    parser.add_argument("--workers", type=int, default=1, help=f"worker processes for PDFs and page-range shards (this machine: {default_workers()})")
+    parser.add_argument("--image-format", choices=["webp", "png"], default="webp", help="encoding for extracted images")
+    parser.add_argument("--max-image-side", type=int, default=1600, help="downscale images whose longest side exceeds this (0 = keep size)")
+    parser.add_argument("--sample-fonts", action="store_true", help="estimate heading sizes from a page sample instead of every page (faster, may miss rare sizes)")
+    parser.add_argument("--force", action="store_true", help="rebuild every book, even if unchanged since the last run")
+    add_resume_argument(parser)
+    add_arguments(parser)
+    args = parser.parse_args()
+
     BOOK_DIR = os.path.join("src", "assets", "book")
     # Output to the generated tutorials data folder
     OUTPUT_DIR = os.path.join("src", "data", "generated_tutorials")
     # Assets for images
     ASSETS_DIR = os.path.join("src", "assets", "generated_images")
     
-    extractor = ElitePDFExtractor(BOOK_DIR, OUTPUT_DIR, ASSETS_DIR)
-    extractor.run()
+    extractor = ElitePDFExtractor(BOOK_DIR, OUTPUT_DIR, ASSETS_DIR, stream=args.stream,
+                                  image_format=args.image_format, max_image_side=args.max_image_side,
+                                  sample_fonts=args.sample_fonts, metrics=from_args(args),
+                                  resume=args.resume)
+    try:
+        extractor.run(workers=args.workers, force=args.force)
+    finally:
+        extractor.metrics.close()
@@ -0,0 +1,113 @@
+import json
+import random
+import argparse
+import asyncio
+
+DEFAULT_PORT = 8765
+# Settings of a model that names only some of them
+MODEL_DEFAULTS = {"latency": 0.1, "error_rate": 0.0, "status": 503, "failures": 0}
+
+
+def parse_model(value):
+    """NAME[:LATENCY[:ERROR_RATE[:STATUS]]], e.g. gemini-flash-latest:0.5:0.1:429."""
+    name, *rest = value.split(":")
+    try:
+        latency = float(rest[0]) if len(rest) > 0 else 0.1
+        error_rate = float(rest[1]) if len(rest) > 1 else 0.0
+        status = int(rest[2]) if len(rest) > 2 else 503
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected NAME[:LATENCY[:ERROR_RATE[:STATUS]]], got {value}")
+    return name, {"latency": latency, "error_rate": error_rate, "status": status}
+
+
+class FakeGemini:
+    """Local stand-in for the ListModels and generateContent endpoints.
+
+    Each model answers after its `latency` seconds; its first `failures`
+    calls, and a share `error_rate` of the others, fail with `status`
+    instead (429s carry Retry-After; a 200 is a reply blocked by the
+    safety filter, with no content). Unset settings take MODEL_DEFAULTS. A
+    negative latency makes the model hang, as a stalled connection does.
+    Replies are tutorial JSON describing the prompt, so the converters run
+    end to end. Point them at it with GEMINI_API_BASE=<base_url>.
+    `calls` counts the requests each model received. With port 0 a free
+    port is picked on entry.
+
+        async with FakeGemini({"gemini-flash-latest": {"latency": 0.2}}) as fake:
+            os.environ["GEMINI_API_BASE"] = fake.base_url
+    """
+
+    def __init__(self, models, port=DEFAULT_PORT, seed=0):
+        self.models = {name: {**MODEL_DEFAULTS, **spec} for name, spec in models.items()}
+        self.port = port
+        self.calls = {name: 0 for name in models}
+        self._random = random.Random(seed)
+        self._runner = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1beta"
+
+    async def list_models(self, request):
+        from aiohttp import web
+
+        return web.json_response({"models": [
+            {"name": f"models/{name}", "supportedGenerationMethods": ["generateContent", "countTokens"]}
+            for name in self.models]})
+
+    async def generate(self, request):
+        from aiohttp import web
+
+        name = request.match_info["name"]
+        if name not in self.models:
+            return web.Response(status=404, text=f"model {name} not found")
+        model = self.models[name]
+        self.calls[name] += 1
+        if model["latency"] < 0:
+            await asyncio.sleep(3600)
+        await asyncio.sleep(model["latency"])
+        if self.calls[name] <= model["failures"] or self._random.random() < model["error_rate"]:
+            if model["status"] == 200:
+                return web.json_response({"candidates": [{"finishReason": "SAFETY"}]})
+            headers = {"Retry-After": "1"} if model["status"] == 429 else {}
+            return web.Response(status=model["status"], text=f"fake {model['status']} from {name}", headers=headers)
+        body = await request.json()
+        prompt = body["contents"][0]["parts"][0]["text"]
+        reply = {"title": f"Module from {name}", "slug": "fake", "description": f"{len(prompt)} prompt characters",
+                 "tags": ["Fake"], "content": f"## Converted by {name}\n\n{prompt[-200:]}"}
+        return web.json_response({"candidates": [{"content": {"parts": [{"text": json.dumps(reply)}]}}]})
+
+    async def __aenter__(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/v1beta/models", self.list_models)
+        app.router.add_post("/v1beta/models/{name}:generateContent", self.generate)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
+        self._runner = None
+
+
+async def serve(models, port):
+    async with FakeGemini(models, port) as fake:
+        print(f"Fake Gemini API on {fake.base_url} serving {', '.join(models)} (Ctrl+C stops)")
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake Gemini API for testing routing and failover locally.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model", type=parse_model, action="append", default=[], metavar="NAME[:LATENCY[:ERROR_RATE[:STATUS]]]",
+                        help="a model to serve; may be repeated (latency -1 hangs)")
+    args = parser.parse_args()
+    models = dict(args.model) or dict(map(parse_model, ["gemini-flash-latest:0.5", "gemini-flash-lite-latest:0.2"]))
+    try:
+        asyncio.run(serve(models, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,62 @@
+import random
+from collections import Counter
+
+from page_cache import compact_page
+
+
+def heading_thresholds(size_counts):
+    """Returns (body, h1, h2, h3) font sizes from a {size: span_count} histogram."""
+    # The most common font size is likely the body text
+    common_sizes = sorted(size_counts.items(), key=lambda x: x[1], reverse=True)
+    body_size = common_sizes[0][0] if common_sizes else 10
+
+    # Headings are usually larger than body text
+    headings = [size for size, count in common_sizes if size > body_size]
+    headings.sort(reverse=True)
+
+    # Assign levels (rough heuristic)
+    h1_size = headings[0] if len(headings) > 0 else body_size + 4
+    h2_size = headings[1] if len(headings) > 1 else body_size + 2
+    h3_size = headings[2] if len(headings) > 2 else body_size + 1
+    return body_size, h1_size, h2_size, h3_size
+
+
+def sample_pages(doc, sample_size=48, outline_pages=16, seed=0):
+    """Stratified page sample: one random page from each of `sample_size`
+    equal strata, plus the first pages of up to `outline_pages` top-level
+    bookmarks (chapter openers carry the rare, largest heading sizes)."""
+    n = len(doc)
+    rng = random.Random(seed)
+    pages = set()
+    for k in range(sample_size):
+        lo, hi = k * n // sample_size, (k + 1) * n // sample_size
+        if hi > lo:
+            pages.add(rng.randrange(lo, hi))
+    chapters = [p - 1 for level, _, p in doc.get_toc(simple=True) if level == 1 and 0 < p <= n]
+    pages.update(chapters[:outline_pages])
+    return sorted(pages)
+
+
+def detect_thresholds(doc, sample_size=48, min_pages=160, records=None):
+    """Estimates heading thresholds from a page sample, or None if unsure.
+
+    Books shorter than `min_pages` are not worth sampling. The sample is
+    split into two interleaved halves; the estimate is trusted only if both
+    halves agree on all four sizes. Returns (body, h1, h2, h3) from the
+    whole sample, or None so the caller falls back to a full histogram.
+    A heading size that only occurs on unsampled pages is missed, so
+    H2/H3 can come out lower than a full pass would find. The sampled
+    compact pages are appended to `records` if given.
+    """
+    if len(doc) < min_pages:
+        return None
+    halves = (Counter(), Counter())
+    for k, i in enumerate(sample_pages(doc, sample_size)):
+        record = compact_page(doc.load_page(i), halves[k % 2])
+        if records is not None:
+            records.append(record)
+    a, b = heading_thresholds(halves[0]), heading_thresholds(halves[1])
+    if a != b:
+        print(f"Font sample inconclusive ({a} vs {b}), using full pass")
+        return None
+    return heading_thresholds(halves[0] + halves[1])
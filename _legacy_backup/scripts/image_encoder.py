@@ -0,0 +1,126 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow is optional; without it images stay full-size PNG
+    Image = None
+
+
+def webp_supported():
+    return Image is not None and features.check("webp")
+
+
+def thumb_name(img_name):
+    stem, ext = os.path.splitext(img_name)
+    return f"{stem}.thumb{ext}"
+
+
+class ImageEncoder:
+    """Encodes extracted pixmaps off the page loop.
+
+    The page walk only snapshots each pixmap's samples; downscaling to
+    `max_side`, WebP/PNG encoding and thumbnails run on a thread pool, since
+    Pillow releases the GIL while resizing and encoding. Images with
+    few colours (diagrams, line art) are stored losslessly, photos as lossy
+    WebP. Without Pillow, or with fmt="png", the encoder falls back to
+    PyMuPDF's PNG writer in the calling thread.
+    """
+
+    def __init__(self, fmt="webp", max_side=1600, thumb_side=320, quality=80, workers=None):
+        if fmt == "webp" and not webp_supported():
+            print("Warning: Pillow with WebP support not available, writing PNG instead.")
+            fmt = "png"
+        self.use_pillow = Image is not None
+        self.fmt = fmt
+        self.ext = f".{fmt}"
+        # Resizing and thumbnails need Pillow
+        self.max_side = max_side if self.use_pillow else 0
+        self.thumb_side = thumb_side if self.use_pillow else 0
+        self.quality = quality
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self._pool = None
+        # Caps how many raw snapshots can wait in the queue at once
+        self._slots = threading.BoundedSemaphore(self.workers * 4)
+        self._futures = []
+        self._lock = threading.Lock()
+        self.stats = {"images": 0, "raw_bytes": 0, "written_bytes": 0, "thumb_bytes": 0}
+
+    @property
+    def settings(self):
+        """The knobs that change output files, for the build manifest."""
+        return {"format": self.fmt, "max_side": self.max_side,
+                "thumb_side": self.thumb_side, "quality": self.quality}
+
+    def submit(self, pix, img_path):
+        """Queues `pix` (already RGB/Gray) to be written at `img_path` plus a thumbnail."""
+        if not self.use_pillow:
+            tmp_path = f"{img_path}.{os.getpid()}.tmp"
+            pix.save(tmp_path, output="png")
+            os.replace(tmp_path, img_path)
+            self._count(pix.width * pix.height * pix.n, os.path.getsize(img_path), 0)
+            return
+        mode = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}[pix.n]
+        snapshot = (mode, pix.width, pix.height, pix.samples)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._slots.acquire()
+        self._futures.append(self._pool.submit(self._encode, snapshot, img_path))
+
+    def _encode(self, snapshot, img_path):
+        try:
+            mode, width, height, samples = snapshot
+            im = Image.frombytes(mode, (width, height), samples)
+            lossless = im.getcolors(256) is not None
+            if self.max_side and max(width, height) > self.max_side:
+                im.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+            written = self._save(im, img_path, lossless)
+            thumb_bytes = 0
+            if self.thumb_side:
+                im.thumbnail((self.thumb_side, self.thumb_side), Image.LANCZOS)
+                thumb_path = os.path.join(os.path.dirname(img_path), thumb_name(os.path.basename(img_path)))
+                thumb_bytes = self._save(im, thumb_path, lossless)
+            self._count(len(samples), written, thumb_bytes)
+        except Exception as e:
+            print(f"Warning: Could not encode image {os.path.basename(img_path)}: {e}")
+        finally:
+            self._slots.release()
+
+    def _save(self, im, path, lossless):
+        # Temp name + rename keeps concurrent writers of the same image safe
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if self.fmt == "webp":
+            im.save(tmp_path, "WEBP", lossless=lossless, quality=self.quality, method=4)
+        else:
+            im.save(tmp_path, "PNG", optimize=lossless)
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+
+    def _count(self, raw, written, thumb):
+        with self._lock:
+            self.stats["images"] += 1
+            self.stats["raw_bytes"] += raw
+            self.stats["written_bytes"] += written
+            self.stats["thumb_bytes"] += thumb
+
+    def flush(self):
+        """Waits until every image queued so far is on disk."""
+        for f in self._futures:
+            f.result()
+        self._futures = []
+
+    def close(self):
+        """Waits for queued images and returns the byte statistics."""
+        if self._pool is not None:
+            self.flush()
+            self._pool.shutdown()
+            self._pool = None
+        self._futures = []
+        s = self.stats
+        if s["images"]:
+            saved = s["raw_bytes"] - s["written_bytes"] - s["thumb_bytes"]
+            print(f"Encoded {s['images']} images: {s['raw_bytes'] / 1e6:.1f} MB raw -> "
+                  f"{(s['written_bytes'] + s['thumb_bytes']) / 1e6:.1f} MB written "
+                  f"({saved / 1e6:.1f} MB saved)")
+        return dict(s)
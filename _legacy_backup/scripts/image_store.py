@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+
+import fitz  # PyMuPDF
+
+from image_encoder import thumb_name
+
+PUBLIC_PREFIX = "/src/assets/generated_images"
+
+
+class ImageStore:
+    """Content-addressed image writer for one open document.
+
+    Images are deduplicated by xref within the document and by a hash of
+    the raw (still encoded) image stream across documents and runs, so a
+    logo repeated on every page is decoded and written once and every page
+    references the same file. The encoder settings are part of the hash:
+    files written with another size, quality or format are never reused.
+    """
+
+    def __init__(self, doc, assets_dir, encoder=None, public_prefix=PUBLIC_PREFIX):
+        self.doc = doc
+        self.assets_dir = assets_dir
+        # Optional ImageEncoder; without one images are saved as PNG inline
+        self.encoder = encoder
+        self.ext = encoder.ext if encoder else ".png"
+        settings = encoder.settings if encoder else {"format": "png"}
+        self._settings = json.dumps(settings, sort_keys=True).encode()
+        self.public_prefix = public_prefix
+        self._by_xref = {}
+        # Names queued in this run; the encoder may not have written them yet
+        self._names = set()
+        self.decoded = 0
+        self.reused = 0
+
+    def content_key(self, img):
+        """Hash of the image stream, the geometry needed to decode it and the encoder settings."""
+        xref, _, width, height, bpc, colorspace = img[:6]
+        h = hashlib.sha256(f"{width}x{height}:{bpc}:{colorspace}:".encode())
+        h.update(self._settings)
+        h.update(self.doc.xref_stream_raw(xref) or b"")
+        return h.hexdigest()[:24]
+
+    def image_path(self, img):
+        """Returns the public path for one get_images() entry, writing it if new."""
+        xref = img[0]
+        if xref in self._by_xref:
+            self.reused += 1
+            return self._by_xref[xref]
+
+        img_name = f"img-{self.content_key(img)}{self.ext}"
+        img_path = os.path.join(self.assets_dir, img_name)
+        if img_name in self._names or os.path.exists(img_path):
+            self.reused += 1
+        else:
+            try:
+                pix = fitz.Pixmap(self.doc, xref)
+                # Convert to RGB if it's CMYK or has other incompatible formats
+                if pix.n - pix.alpha >= 4:
+                    pix = fitz.Pixmap(fitz.csRGB, pix)
+                if self.encoder:
+                    self.encoder.submit(pix, img_path)
+                else:
+                    # Write beside the target and rename, so parallel workers
+                    # that hit the same image never expose a half-written file
+                    tmp_path = f"{img_path}.{os.getpid()}.tmp"
+                    pix.save(tmp_path, output="png")
+                    os.replace(tmp_path, img_path)
+            except Exception as e:
+                print(f"Warning: Could not save image {img_name}: {e}")
+                self._by_xref[xref] = None
+                return None
+            self.decoded += 1
+
+        self._names.add(img_name)
+        public = f"{self.public_prefix}/{img_name}"
+        self._by_xref[xref] = public
+        return public
+
+    def page_images(self, page):
+        """Public paths of a page's images, in order and without repeats."""
+        paths = []
+        for img in page.get_images(full=True):
+            path = self.image_path(img)
+            if path and path not in paths:
+                paths.append(path)
+        return paths
+
+
+def image_files(img_map, assets_dir, thumbnails=False):
+    """On-disk files behind a {page: [public_path]} map, for the build manifest."""
+    names = {os.path.basename(p) for page_imgs in img_map.values() for p in page_imgs}
+    if thumbnails:
+        names |= {thumb_name(n) for n in names}
+    return sorted(os.path.join(assets_dir, n) for n in names)
@@ -0,0 +1,133 @@
+import numpy as np
+
+# PyMuPDF span flag bits kept on compact lines
+MONO, BOLD = 8, 16
+
+# Line kinds from classify_lines()
+BODY, H1, H2, H3, CODE = range(5)
+
+# Page width is scanned for column gutters in this many steps
+GRID_STEPS = 240
+_GRID = np.linspace(0.0, 1.0, GRID_STEPS)
+# Pages classified per NumPy call by classify_pages()
+PAGE_BATCH = 64
+
+
+def reading_order(boxes, line_counts, width, min_blocks=2, min_gutter=0.015):
+    """Block indices in reading order for a multi-column page, or None.
+
+    `boxes` are the text blocks' (x0, y0, x1, y1) and `line_counts` their
+    numbers of lines. Blocks narrower than
+    about half the page are laid over an x grid; runs of grid steps no such
+    block touches (at least `min_gutter` of the width, between the leftmost
+    and rightmost text) are column gutters. Blocks spanning a gutter
+    (titles, wide figures) split the page into bands read top to bottom;
+    within a band, columns are read left to right and each top to bottom.
+    None means one column: the extraction order is kept. Pages whose
+    "columns" have fewer than `min_blocks` blocks, are narrower than a
+    quarter page or do not sit side by side are not treated as columns,
+    nor are tables (short cells, most of them level with a cell in the
+    next column).
+    """
+    # Most pages have too few narrow blocks to hold columns; skip NumPy for them
+    if sum(1 for b in boxes if b[2] - b[0] < 0.55 * width) < 2 * min_blocks:
+        return None
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    line_counts = np.asarray(line_counts)
+    x0, y0, x1, y1 = boxes.T
+    narrow = (x1 - x0) < 0.55 * width
+    grid = _GRID * width
+    covered = ((grid >= x0[narrow, None]) & (grid <= x1[narrow, None])).any(axis=0)
+    free = ~covered & (grid > x0[narrow].min()) & (grid < x1[narrow].max())
+
+    # Runs of free grid steps: +1 where a run starts, -1 after it ends
+    edges = np.diff(np.concatenate(([0], free.astype(np.int8), [0])))
+    starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    wide = (stops - starts) * width / GRID_STEPS >= min_gutter * width
+    if not wide.any():
+        return None
+    gutters = (grid[starts[wide]] + grid[stops[wide] - 1]) / 2
+
+    col = np.searchsorted(gutters, (x0 + x1) / 2)
+    n_cols = len(gutters) + 1
+    for c in range(n_cols):
+        in_col = narrow & (col == c)
+        if in_col.sum() < min_blocks or x1[in_col].max() - x0[in_col].min() < 0.25 * width:
+            return None
+    # Neighbouring columns must overlap vertically, or this is a staggered layout
+    cells = np.median(line_counts[narrow]) <= 2
+    for c in range(n_cols - 1):
+        a, b = narrow & (col == c), narrow & (col == c + 1)
+        overlap = min(y1[a].max(), y1[b].max()) - max(y0[a].min(), y0[b].min())
+        shorter = min(y1[a].max() - y0[a].min(), y1[b].max() - y0[b].min())
+        if overlap < 0.3 * shorter:
+            return None
+        aligned = (np.abs(y0[a][:, None] - y0[b][None, :]) < 2).any(axis=1)
+        if cells and aligned.mean() > 0.5:
+            return None
+
+    spanning = np.sort(y0[~narrow])
+    band = np.searchsorted(spanning, y0, side="right")
+    col = np.where(narrow, col, -1)
+    return np.lexsort((y0, col, band))
+
+
+def classify_lines(lines, thresholds):
+    """Kind of every (size, text, bbox, flags) line as an int array.
+
+    Short lines at the H1/H2/H3 sizes are headings; other lines set
+    entirely in a monospaced font are code; everything else is body text.
+    """
+    n = len(lines)
+    if not n:
+        return np.zeros(0, dtype=np.int8)
+    _, h1_size, h2_size, h3_size = thresholds
+    sizes = np.fromiter((line[0] for line in lines), dtype=float, count=n)
+    lengths = np.fromiter((len(line[1]) for line in lines), dtype=np.int32, count=n)
+    flags = np.fromiter((line[3] for line in lines), dtype=np.int32, count=n)
+    short = lengths < 100
+    return np.select(
+        [short & (sizes >= h1_size), short & (sizes >= h2_size), short & (sizes >= h3_size), (flags & MONO) != 0],
+        [H1, H2, H3, CODE], BODY).astype(np.int8)
+
+
+def code_indents(lines, kinds):
+    """Leading spaces for each line, recovered from x offsets within its code run.
+
+    Only CODE lines get an indent; a run's leftmost line is at column zero.
+    Monospaced glyphs are taken as about 0.55 em wide.
+    """
+    n = len(lines)
+    is_code = kinds == CODE
+    if not is_code.any():
+        return np.zeros(n, dtype=np.int32)
+    x0 = np.fromiter((line[2][0] for line in lines), dtype=float, count=n)
+    sizes = np.fromiter((line[0] for line in lines), dtype=float, count=n)
+    # Number the runs of consecutive code lines and take each run's left edge
+    run = np.cumsum(np.concatenate(([True], is_code[1:] != is_code[:-1])))
+    left = np.full(run.max() + 1, np.inf)
+    np.minimum.at(left, run[is_code], x0[is_code])
+    indent = np.rint((x0 - left[run]) / (0.55 * sizes))
+    return np.where(is_code, np.clip(indent, 0, 40), 0).astype(np.int32)
+
+
+def classify_pages(pages, thresholds, batch=PAGE_BATCH):
+    """Yields (blocks, [(kind, code_indent), ...]) for each compact page.
+
+    Lines of `batch` pages at a time are classified in one go, so the
+    NumPy call overhead is paid per batch rather than per page; a code run
+    that continues on the next page keeps its left edge.
+    """
+    pages = iter(pages)
+    while True:
+        chunk = [blocks for _, blocks in zip(range(batch), pages)]
+        if not chunk:
+            return
+        lines = [line for blocks in chunk for block in blocks for line in block]
+        kinds = classify_lines(lines, thresholds)
+        classes = list(zip(kinds.tolist(), code_indents(lines, kinds).tolist()))
+        start = 0
+        for blocks in chunk:
+            stop = start + sum(len(block) for block in blocks)
+            yield blocks, classes[start:stop]
+            start = stop
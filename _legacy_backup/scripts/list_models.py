@@ -1,40 +1,223 @@
 import os
-import requests
-from dotenv import load_dotenv
-
-# Manually load environment variables
-env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-print(f"Loading .env from: {env_path}")
-
-try:
-    with open(env_path, 'r', encoding='utf-8-sig') as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            if '=' in line:
-                key, value = line.split('=', 1)
-                os.environ[key.strip()] = value.strip().strip('"').strip("'")
-except Exception as e:
-    print(f"Error reading .env: {e}")
-
-API_KEY = os.getenv("VITE_GEMINI_API_KEY")
-
-if not API_KEY:
-    print("API Key not found")
-    exit(1)
-
-url = f"https://generativelanguage.googleapis.com/v1beta/models?key={API_KEY}"
-
-try:
-    response = requests.get(url)
-    if response.status_code == 200:
-        models = response.json().get('models', [])
-        print("Available Models:")
-        for model in models:
+import json
+import time
+import argparse
+import asyncio
+
+import config
+from llm_client import DEFAULT_BASE_URL, DEFAULT_MODEL, LLMError
+
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.dirname(__file__), '..', '.cache', 'model-registry.json')
+REGISTRY_VERSION = 1
+DAY = 24 * 60 * 60
+
+# Models chunks may be routed to, in order of preference while none has
+# been measured yet; GEMINI_MODELS (comma-separated) overrides the list
+PREFERRED_MODELS = (DEFAULT_MODEL, "gemini-flash-lite-latest")
+# Weight of the newest call in the moving averages
+ALPHA = 0.2
+# A model whose smoothed error rate is above this is skipped...
+MAX_ERROR_RATE = 0.5
+# ...until it has gone this long without a call, then it gets another try
+PROBE_SECONDS = 120
+# Cooldown after a 429 that carried no Retry-After
+RATE_LIMIT_COOLDOWN = 60
+# Per-attempt timeouts never drop below this, and need this many samples
+MIN_TIMEOUT = 5.0
+MIN_SAMPLES = 3
+
+
+def candidate_models():
+    """The models chunks may be routed to: GEMINI_MODELS or PREFERRED_MODELS."""
+    env = [m.strip() for m in os.getenv("GEMINI_MODELS", "").split(",") if m.strip()]
+    return env or list(PREFERRED_MODELS)
+
+
+async def fetch_models(session, api_key, base_url=DEFAULT_BASE_URL):
+    """Names of the models that offer generateContent, from the ListModels endpoint."""
+    names, token = [], None
+    while True:
+        params = {"key": api_key, "pageSize": 1000}
+        if token:
+            params["pageToken"] = token
+        async with session.get(f"{base_url.rstrip('/')}/models", params=params) as res:
+            if res.status != 200:
+                raise LLMError(f"ListModels failed: {res.status} - {(await res.text())[:300]}", res.status)
+            data = await res.json()
+        if not isinstance(data, dict):
+            raise ValueError(f"ListModels replied with {type(data).__name__}, not an object")
+        for model in data.get("models", []):
             if 'generateContent' in model.get('supportedGenerationMethods', []):
-                print(f"- {model['name']}")
-    else:
-        print(f"Error: {response.status_code} - {response.text}")
-except Exception as e:
-    print(f"Network error: {e}")
+                names.append(model["name"].removeprefix("models/"))
+        token = data.get("nextPageToken")
+        if not token:
+            return names
+
+
+class ModelRegistry:
+    """Cached model list plus health statistics from our own calls, for routing.
+
+    Stored in `path` (beside the other caches): the models the API lists,
+    re-fetched once the list is older than `ttl`, and per model the
+    smoothed latency of successful calls (and its mean deviation), the
+    smoothed error rate, a cooldown set by 429 responses (Retry-After)
+    and the remaining request quota when the server reports one.
+    route() orders the `candidates` fastest healthy model first; the
+    client fails over down that list instead of retrying one model.
+    """
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH, ttl=DAY, candidates=None):
+        self.path = path
+        self.ttl = ttl
+        self.candidates = list(candidates or candidate_models())
+        self.listed_at = 0.0
+        self.available = []
+        self.stats = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == REGISTRY_VERSION:
+                self.listed_at = data.get("listed_at", 0.0)
+                self.available = data.get("models", [])
+                self.stats = data.get("stats", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: starting a fresh model registry, {path} is unreadable: {e}")
+
+    @property
+    def stale(self):
+        return not self.available or time.time() - self.listed_at > self.ttl
+
+    async def refresh(self, session, api_key, base_url=DEFAULT_BASE_URL, force=False):
+        """Re-lists the models if the cached list is stale; keeps the old list if that fails."""
+        if not (force or self.stale):
+            return
+        import aiohttp
+
+        try:
+            self.available = await fetch_models(session, api_key, base_url)
+            self.listed_at = time.time()
+        # ValueError: a reply that is not a JSON object
+        except (LLMError, OSError, asyncio.TimeoutError, aiohttp.ClientError, ValueError) as e:
+            print(f"Warning: could not list models ({e}), using the cached list")
+
+    def stat(self, model):
+        return self.stats.setdefault(model, {
+            "calls": 0, "errors": 0, "latency": None, "deviation": 0.0, "error_rate": 0.0,
+            "cooldown_until": 0.0, "headroom": None, "last_call": 0.0,
+        })
+
+    def record(self, model, seconds, ok, status=None, retry_after=None, headroom=None):
+        """Folds one call's outcome into the model's statistics."""
+        s = self.stat(model)
+        now = time.time()
+        s["calls"] += 1
+        s["last_call"] = now
+        if headroom is not None:
+            s["headroom"] = headroom
+        if status == 429:
+            # Rate limits are a cooldown, not a sign of an unhealthy model
+            try:
+                wait = float(retry_after)
+            except (TypeError, ValueError):
+                wait = RATE_LIMIT_COOLDOWN
+            s["cooldown_until"] = now + wait
+            s["headroom"] = 0
+            return
+        s["error_rate"] = (1 - ALPHA) * s["error_rate"] + ALPHA * (0.0 if ok else 1.0)
+        if ok:
+            if s["latency"] is None:
+                s["latency"] = seconds
+            else:
+                s["deviation"] = (1 - ALPHA) * s["deviation"] + ALPHA * abs(seconds - s["latency"])
+                s["latency"] = (1 - ALPHA) * s["latency"] + ALPHA * seconds
+        else:
+            s["errors"] += 1
+
+    def healthy(self, model, now=None):
+        now = now or time.time()
+        s = self.stats.get(model)
+        if s is None:
+            return True
+        if now < s["cooldown_until"]:
+            return False
+        return s["error_rate"] <= MAX_ERROR_RATE or now - s["last_call"] > PROBE_SECONDS
+
+    def route(self):
+        """Candidate models to try in order: healthy ones fastest first (unmeasured
+        ones before them, so each gets measured), then the rest by cooldown."""
+        models = self.candidates
+        if self.available:
+            models = [m for m in models if m in self.available] or models
+        now = time.time()
+        rank = {m: k for k, m in enumerate(models)}
+
+        def speed(m):
+            s = self.stats.get(m)
+            return (s["latency"] if s and s["latency"] is not None else 0.0, rank[m])
+
+        healthy = sorted((m for m in models if self.healthy(m, now)), key=speed)
+        rest = sorted((m for m in models if m not in healthy),
+                      key=lambda m: (self.stats[m]["cooldown_until"], rank[m]))
+        return healthy + rest
+
+    def timeout(self, model, default):
+        """Seconds to give one call to `model` before failing over.
+
+        A few deviations above its usual latency once it has been measured,
+        so a stalled request is abandoned long before `default`.
+        """
+        s = self.stats.get(model)
+        if s is None or s["latency"] is None or s["calls"] - s["errors"] < MIN_SAMPLES:
+            return default
+        return min(default, max(MIN_TIMEOUT, 2 * s["latency"] + 4 * s["deviation"]))
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"version": REGISTRY_VERSION, "listed_at": self.listed_at, "models": self.available,
+                       "stats": self.stats}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+async def show(refresh=False, base_url=None):
+    import aiohttp
+
+    api_key = config.gemini_key()
+    if not api_key:
+        print("API Key not found")
+        return 1
+    base_url = base_url or os.getenv("GEMINI_API_BASE") or DEFAULT_BASE_URL
+    registry = ModelRegistry()
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+        await registry.refresh(session, api_key, base_url, force=refresh)
+    registry.save()
+
+    print("Available Models:")
+    for model in registry.available:
+        print(f"- {model}")
+    print("\nRouting order:")
+    for model in registry.route():
+        s = registry.stats.get(model)
+        if s is None:
+            print(f"- {model:<32} not called yet")
+            continue
+        latency = "-" if s["latency"] is None else f"{s['latency']:.2f}s"
+        state = "healthy" if registry.healthy(model) else "unhealthy"
+        print(f"- {model:<32} {state:<10} latency {latency} +/- {s['deviation']:.2f}s, "
+              f"errors {s['error_rate']:.0%} ({s['errors']}/{s['calls']}), headroom {s['headroom']}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List Gemini models and the routing statistics of our calls.")
+    parser.add_argument("--refresh", action="store_true", help="re-list the models even if the cached list is fresh")
+    parser.add_argument("--base-url", help="API base URL (default: GEMINI_API_BASE or Google's endpoint)")
+    args = parser.parse_args()
+    exit(asyncio.run(show(args.refresh, args.base_url)))
+
+
+if __name__ == "__main__":
+    main()
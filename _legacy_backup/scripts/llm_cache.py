@@ -0,0 +1,160 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+from llm_client import UNUSABLE_REPLY, LLMError
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', '.cache', 'llm-responses.sqlite')
+
+DAY = 24 * 60 * 60
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """On-disk cache of model replies keyed on (model, prompt template, chunk).
+
+    `model` is the model that actually answered. Successes and failures are
+    stored separately: replies live for `ttl`, definite API failures (e.g.
+    a 400 for an oversized chunk) only for `failure_ttl`, so a rerun doesn't
+    hammer a request that is known to fail but retries it soon after. When
+    the stored replies exceed `max_bytes` the least recently used ones are
+    evicted; the total is tracked as entries are written, so eviction only
+    scans the table once the budget is actually exceeded.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=30 * DAY, failure_ttl=15 * 60, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                ok INTEGER NOT NULL,
+                status INTEGER,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+        self.evict()
+
+    @staticmethod
+    def key(model, template, chunk):
+        return _digest(f"{model}\0{_digest(template)}\0{_digest(chunk)}")
+
+    def get(self, models, template, chunk):
+        """Returns (model, ok, value, status) for the first of `models` with a
+        fresh entry, or None on a miss."""
+        now = time.time()
+        for model in models:
+            key = self.key(model, template, chunk)
+            row = self.db.execute("SELECT ok, value, status, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                continue
+            ok, value, status, created = row
+            if now - created <= (self.ttl if ok else self.failure_ttl):
+                self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                self.db.commit()
+                self.hits += 1
+                return model, bool(ok), value, status
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.db.commit()
+        self.misses += 1
+        return None
+
+    def put(self, model, template, chunk, value, ok=True, status=None):
+        now = time.time()
+        key = self.key(model, template, chunk)
+        size = len(value.encode('utf-8'))
+        old = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self.db.execute(
+            "INSERT OR REPLACE INTO responses (key, model, ok, status, value, size, created, accessed)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, model, int(ok), status, value, size, now, now))
+        self.db.commit()
+        self._size += size - (old[0] if old else 0)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Drops expired entries, then least recently used ones over max_bytes."""
+        now = time.time()
+        self.db.execute("DELETE FROM responses WHERE (ok = 1 AND created < ?) OR (ok = 0 AND created < ?)",
+                        (now - self.ttl, now - self.failure_ttl))
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self._size = total
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            doomed = []
+            for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= size
+            self.db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self._size = self.max_bytes + excess
+        self.db.commit()
+
+    def close(self):
+        if self.hits or self.misses:
+            print(f"Response cache: {self.hits} hits, {self.misses} misses")
+        self.db.close()
+
+
+async def cached_generate(client, cache, template, chunk, model=None, parse=None):
+    """client.generate(template + chunk), answered from `cache` when possible.
+
+    With `parse`, returns parse(reply); a reply it rejects (ValueError) is
+    a definite failure with status UNUSABLE_REPLY, cached with the short
+    failure TTL like other definite failures, so a broken reply is asked
+    for again later instead of being replayed for the full TTL.
+
+    Raises LLMError for live and cached failures alike. Only definite
+    failures are cached: quota, server and network errors (retryable ones)
+    are not, so fallbacks and resumed runs still get a chance.
+
+    Entries are stored under the model that answered. Without a `model`,
+    a routed client may be answered by any of client.models(), so those
+    are looked up in order of preference.
+    """
+    def parsed(name, text):
+        if parse is None:
+            return text
+        try:
+            return parse(text)
+        except ValueError as e:
+            error = LLMError(f"Unparseable reply from {name}: {e}; reply: {text[:500]}", UNUSABLE_REPLY, name)
+        if cache is not None:
+            cache.put(name, template, chunk, str(error), ok=False, status=UNUSABLE_REPLY)
+        raise error
+
+    if cache is not None:
+        hit = cache.get([model] if model else client.models(), template, chunk)
+        if hit is not None:
+            name, ok, value, status = hit
+            if ok:
+                return parsed(name, value)
+            raise LLMError(f"Cached failure: {value}", status, name)
+    try:
+        model, text = await client.generate_with_model(template + chunk, model=model)
+    except LLMError as e:
+        if cache is not None and not e.retryable and e.model:
+            cache.put(e.model, template, chunk, str(e), ok=False, status=e.status)
+        raise
+    result = parsed(model, text)
+    if cache is not None:
+        cache.put(model, template, chunk, text)
+    return result
@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import random
+import asyncio
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+DEFAULT_MODEL = "gemini-flash-latest"
+
+# Statuses worth retrying: rate limit, and transient server-side failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Status of a 200 reply that carries no text (blocked by a safety filter,
+# or not the JSON we expect): the same prompt gets the same reply again
+UNUSABLE_REPLY = 200
+
+
+class LLMError(Exception):
+    """A request that failed for good (non-retryable status or retries exhausted)."""
+
+    def __init__(self, message, status=None, model=None):
+        super().__init__(message)
+        self.status = status
+        # The model that gave the final answer, if one did
+        self.model = model
+
+    @property
+    def retryable(self):
+        """True for quota, server and network failures: the same request may succeed later.
+
+        Unusable replies (status UNUSABLE_REPLY) and client errors are final.
+        """
+        return self.status is None or self.status in RETRY_STATUSES
+
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for budgeting
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        # A single request larger than the bucket may go once the bucket is full
+        amount = min(float(amount), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                await asyncio.sleep((amount - self.level) / self.rate)
+
+    def drain(self):
+        """Empties the bucket, e.g. after the server answered 429."""
+        self._refill()
+        self.level = 0.0
+
+
+class GeminiClient:
+    """Async generateContent client with a pooled session and quota-aware pacing.
+
+    Requests are paced by two token buckets (requests/min and tokens/min),
+    capped at `concurrency` in flight, and retried with exponential backoff
+    on 429/5xx, honouring Retry-After. `base_url` can point at a local stub
+    server (GEMINI_API_BASE) for testing. A 200 reply without text (blocked,
+    or malformed) is not retried: it fails with status UNUSABLE_REPLY. With
+    a `metrics` (metrics.Metrics) the time spent waiting on quota and on the
+    API is recorded per request.
+
+    With a `registry` (list_models.ModelRegistry), calls that name no model
+    are routed: each attempt goes down registry.route(), fastest healthy
+    model first, failing over to the next model at once on a 429, 5xx or
+    network error and giving each call the registry's adaptive timeout.
+    Backoff only starts once every model has failed. Each call's outcome
+    is recorded in the registry, which is refreshed on entry and saved on
+    exit.
+
+        async with GeminiClient(api_key) as client:
+            text = await client.generate(prompt)
+    """
+
+    def __init__(self, api_key, model=DEFAULT_MODEL, base_url=None, rpm=15, tpm=1_000_000,
+                 concurrency=4, max_retries=6, timeout=120, backoff=2.0, max_backoff=90.0, metrics=None,
+                 registry=None):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = (base_url or os.getenv("GEMINI_API_BASE") or DEFAULT_BASE_URL).rstrip('/')
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retries = 0
+        self.metrics = metrics
+        self.registry = registry
+        self._slots = asyncio.Semaphore(concurrency)
+        self._session = None
+
+    @classmethod
+    def from_env(cls, api_key, **kwargs):
+        """Reads GEMINI_RPM, GEMINI_TPM and GEMINI_CONCURRENCY overrides."""
+        for key, env in (("rpm", "GEMINI_RPM"), ("tpm", "GEMINI_TPM"), ("concurrency", "GEMINI_CONCURRENCY")):
+            if os.getenv(env):
+                kwargs.setdefault(key, int(os.getenv(env)))
+        return cls(api_key, **kwargs)
+
+    async def __aenter__(self):
+        import aiohttp  # only needed once a conversion actually runs
+
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        if self.registry is not None:
+            await self.registry.refresh(self._session, self.api_key, self.base_url)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+        self._session = None
+        if self.registry is not None:
+            self.registry.save()
+
+    def url(self, model=None):
+        return f"{self.base_url}/models/{model or self.model}:generateContent?key={self.api_key}"
+
+    def _delay(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return min(self.max_backoff, float(retry_after))
+            except ValueError:
+                pass  # HTTP-date form; fall back to exponential backoff
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    async def _call(self, payload, model):
+        """One request to `model`: (text, status, retry_after, body); text is None on failure."""
+        import aiohttp
+
+        registry = self.registry
+        options = {}
+        if registry is not None:
+            options["timeout"] = aiohttp.ClientTimeout(total=registry.timeout(model, self.timeout))
+        sent = time.perf_counter()
+        headroom = None
+        try:
+            async with self._session.post(self.url(model), json=payload, **options) as res:
+                headroom = res.headers.get("x-ratelimit-remaining-requests")
+                if res.status == 200:
+                    body = await res.text(errors="replace")
+                    try:
+                        result = json.loads(body)
+                        outcome = result['candidates'][0]['content']['parts'][0]['text'], res.status, None, None
+                    except ValueError:
+                        outcome = None, UNUSABLE_REPLY, None, f"Malformed JSON reply: {body[:300]}"
+                    except (KeyError, IndexError, TypeError):
+                        outcome = None, UNUSABLE_REPLY, None, f"Unexpected response shape: {body[:300]}"
+                else:
+                    outcome = None, res.status, res.headers.get("Retry-After"), await res.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            outcome = None, None, None, str(e) or type(e).__name__
+        finally:
+            elapsed = time.perf_counter() - sent
+            if self.metrics is not None:
+                self.metrics.observe("api_call", elapsed, model=model)
+        if registry is not None:
+            registry.record(model, elapsed, outcome[0] is not None, outcome[1], outcome[2],
+                            int(headroom) if headroom and headroom.isdigit() else None)
+        return outcome
+
+    def models(self):
+        """Models a call that names none may be answered by, in order of preference."""
+        return list(self.registry.candidates) if self.registry is not None else [self.model]
+
+    def _untried(self, model, tried):
+        """Models still to try this attempt, best first."""
+        if model is not None or self.registry is None:
+            models = [model or self.model]
+        else:
+            # Models in cooldown only when nothing else is left
+            models = self.registry.route()
+            models = [m for m in models if self.registry.healthy(m)] or models[:1]
+        return [m for m in models if m not in tried]
+
+    async def generate(self, text, model=None):
+        """Sends one prompt and returns the first candidate's text.
+
+        Without a `model`, the client's registry (if any) picks one per
+        request, when the request gets its slot, so it sees the latest stats.
+        """
+        return (await self.generate_with_model(text, model))[1]
+
+    async def generate_with_model(self, text, model=None):
+        """generate(), returning (model that answered, text)."""
+        payload = {"contents": [{"parts": [{"text": text}]}]}
+        cost = estimate_tokens(text)
+        metrics = self.metrics
+        for attempt in range(self.max_retries + 1):
+            tried = []
+            while True:
+                # Checked before taking quota, so no request is paid for unsent
+                untried = self._untried(model, tried)
+                if not untried:
+                    break
+                waited = time.perf_counter()
+                await self.requests.acquire()
+                await self.tokens.acquire(cost)
+                async with self._slots:
+                    if metrics is not None:
+                        metrics.observe("quota_wait", time.perf_counter() - waited)
+                        metrics.count("api_requests")
+                    # Routed again now, with the stats of the calls that finished meanwhile
+                    name = (self._untried(model, tried) or untried)[0]
+                    tried.append(name)
+                    reply, status, retry_after, body = await self._call(payload, name)
+                if reply is not None:
+                    return name, reply
+                if metrics is not None:
+                    metrics.count(f"api_failed_{status or 'network'}")
+                if status is not None and status not in RETRY_STATUSES:
+                    raise LLMError(f"API Error: {status} - {body[:300]}", status, name)
+                if metrics is not None and self._untried(model, tried):
+                    metrics.count("api_failovers")
+            if not tried:
+                # Nothing to send to (e.g. an empty GEMINI_MODELS); retryable, so
+                # a checkpointed run keeps the chunk pending for a fixed rerun
+                raise LLMError("No model to send the request to")
+
+            if attempt == self.max_retries:
+                break
+            if status == 429 and self.registry is None:
+                self.requests.drain()
+            delay = self._delay(attempt, retry_after)
+            self.retries += 1
+            if metrics is not None:
+                metrics.count("api_retries")
+            print(f"   Retry {attempt + 1}/{self.max_retries} in {delay:.1f}s ({status or body[:80]})")
+            await asyncio.sleep(delay)
+        raise LLMError(f"Gave up after {self.max_retries} retries: {status} - {body[:300]}", status)
+
+
+def clean_json_reply(text):
+    """Parses a JSON object reply, tolerating markdown code fences around it.
+
+    Raises ValueError if the reply is not a JSON object.
+    """
+    data = json.loads(text.replace('```json', '').replace('```', '').strip())
+    if not isinstance(data, dict):
+        raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+    return data
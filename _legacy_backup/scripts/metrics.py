@@ -0,0 +1,145 @@
+import os
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class Metrics:
+    """Stage timers, counters and an optional JSON-lines event log.
+
+    Stages are timed with `stage()` (a start and an end event are logged,
+    so a run stuck inside one shows up in the file); hot per-item timings
+    such as pages or API calls go through `observe()`, which only
+    aggregates and logs items slower than `slow_seconds`. `count()` bumps
+    named counters.
+
+    A Metrics pickled into a worker process comes back empty but logs to
+    the same file; the worker returns `take()` and the parent `merge()`s
+    it. `take()` + `merge()` in one process is a no-op, so code does not
+    need to know whether it ran in a pool.
+
+    `profile` names a file for cProfile stats and `trace_memory` turns on
+    tracemalloc; both cover the parent process from construction to
+    `close()`.
+    """
+
+    def __init__(self, path=None, profile=None, trace_memory=False, slow_seconds=2.0):
+        self.path = path
+        self.slow_seconds = slow_seconds
+        self.timers = {}
+        self.counters = Counter()
+        self._out = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._out = open(path, 'a', encoding='utf-8')
+        self.profile = profile
+        self._profiler = None
+        if profile:
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self.trace_memory = trace_memory
+        if trace_memory:
+            import tracemalloc
+
+            tracemalloc.start()
+
+    def __reduce__(self):
+        return (Metrics, (self.path, None, False, self.slow_seconds))
+
+    def emit(self, event, **fields):
+        if self._out is not None:
+            record = {"ts": round(time.time(), 3), "pid": os.getpid(), "event": event, **fields}
+            self._out.write(json.dumps(record, default=str) + "\n")
+            self._out.flush()
+
+    def _add(self, name, calls, seconds, longest):
+        t = self.timers.setdefault(name, [0, 0.0, 0.0])
+        t[0] += calls
+        t[1] += seconds
+        t[2] = max(t[2], longest)
+
+    def observe(self, name, seconds, **fields):
+        self._add(name, 1, seconds, seconds)
+        if seconds >= self.slow_seconds:
+            self.emit("slow", name=name, seconds=round(seconds, 3), **fields)
+
+    @contextmanager
+    def stage(self, name, **fields):
+        self.emit("start", stage=name, **fields)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._add(name, 1, seconds, seconds)
+            self.emit("end", stage=name, seconds=round(seconds, 3), **fields)
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def take(self):
+        """Returns and clears this instance's timers and counters."""
+        snapshot = {"timers": self.timers, "counters": dict(self.counters)}
+        self.timers, self.counters = {}, Counter()
+        return snapshot
+
+    def merge(self, snapshot):
+        for name, (calls, total, longest) in snapshot["timers"].items():
+            self._add(name, calls, total, longest)
+        self.counters.update(snapshot["counters"])
+
+    def summary(self):
+        """Prints the timer and counter table and logs it as a summary event."""
+        rows = [f"{'Stage':<24}{'calls':>8}{'total s':>11}{'max s':>9}"]
+        for name, (calls, total, longest) in self.timers.items():
+            rows.append(f"{name:<24}{calls:>8}{total:>11.2f}{longest:>9.2f}")
+        if self.counters:
+            rows.append(f"{'Counter':<24}{'value':>28}")
+            for name, value in sorted(self.counters.items()):
+                rows.append(f"{name:<24}{value:>28,}")
+        peak = None
+        if self.trace_memory:
+            import tracemalloc
+
+            peak = tracemalloc.get_traced_memory()[1]
+            rows.append(f"{'traced peak MB':<24}{peak / 1e6:>28.1f}")
+        print("\n" + "\n".join(rows))
+        self.emit("summary", timers={k: {"calls": c, "seconds": round(t, 3), "max": round(m, 3)}
+                                     for k, (c, t, m) in self.timers.items()},
+                  counters=dict(self.counters), traced_peak_bytes=peak)
+
+    def close(self):
+        """Stops the hooks (writing the profile) and closes the event log."""
+        if self._profiler is not None:
+            import pstats
+
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile)
+            print(f"\nProfile written to {self.profile}; top functions by cumulative time:")
+            pstats.Stats(self._profiler).sort_stats("cumulative").print_stats(12)
+            self._profiler = None
+        if self.trace_memory:
+            import tracemalloc
+
+            print("Top allocation sites:")
+            for stat in tracemalloc.take_snapshot().statistics("lineno")[:8]:
+                print(f"   {stat}")
+            tracemalloc.stop()
+            self.trace_memory = False
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+
+
+def add_arguments(parser):
+    """The --metrics/--profile/--trace-memory flags shared by the scripts."""
+    parser.add_argument("--metrics", help="append JSON-lines stage/progress events to this file")
+    parser.add_argument("--profile", help="write cProfile stats for the run to this file")
+    parser.add_argument("--trace-memory", action="store_true", help="track allocations with tracemalloc")
+
+
+def from_args(args):
+    return Metrics(args.metrics, profile=args.profile, trace_memory=args.trace_memory)
@@ -0,0 +1,62 @@
+import re
+from collections import Counter
+from functools import lru_cache
+
+SLUG_DROP_RE = re.compile(r'[^\w\s-]')
+SLUG_DASH_RE = re.compile(r'[\s_-]+')
+# "Intro Page 12" -> "Intro": page numbers glued onto heading lines
+PAGE_SUFFIX_RE = re.compile(r'\s+Page\s+\d+\s*$', re.IGNORECASE)
+# Bare page numbers: "12", "Page 12", "- 12 -", "xiv"
+PAGE_NUMBER_RE = re.compile(r'^[-\s]*(?:page\s+)?(?:\d+|[ivxlc]+)[-\s]*$', re.IGNORECASE)
+SPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=8192)
+def slugify(text):
+    text = SLUG_DROP_RE.sub('', text.lower().strip())
+    return SLUG_DASH_RE.sub('-', text).strip('-')
+
+
+def clean_heading(text):
+    """Heading text without a trailing "Page N"."""
+    return PAGE_SUFFIX_RE.sub('', text).strip()
+
+
+def _line_key(text, bbox):
+    # Page numbers change on every page, so they share one key per position
+    text = "#" if PAGE_NUMBER_RE.match(text) else SPACE_RE.sub(' ', text.lower())
+    return text, round(bbox[1]), round(bbox[3])
+
+
+def _edge_lines(blocks):
+    """The compact lines in the top and bottom rows of a page."""
+    lines = [line for block in blocks for line in block]
+    if not lines:
+        return []
+    top = min(line[2][1] for line in lines)
+    bottom = max(line[2][3] for line in lines)
+    return [line for line in lines if line[2][1] - top < 1 or bottom - line[2][3] < 1]
+
+
+def find_running_lines(pages, min_pages=3):
+    """Keys of header/footer lines: text repeated at the same height across pages.
+
+    Only each page's top and bottom rows are considered, so body text set on
+    a fixed grid is left alone; page numbers match whatever their digits.
+    A key is running once it shows up on at least `min_pages` pages.
+    """
+    seen = Counter()
+    for blocks in pages:
+        seen.update({_line_key(line[1], line[2]) for line in _edge_lines(blocks)})
+    return {key for key, n in seen.items() if n >= min_pages}
+
+
+def strip_running_lines(pages, running):
+    """Yields compact pages with the `running` header/footer lines removed."""
+    for blocks in pages:
+        if running:
+            edges = {id(line) for line in _edge_lines(blocks)}
+            blocks = [[line for line in block
+                       if id(line) not in edges or _line_key(line[1], line[2]) not in running]
+                      for block in blocks]
+        yield blocks
@@ -0,0 +1,91 @@
+import pickle
+import tempfile
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from layout import BOLD, MONO, reading_order
+
+# Text-only dict extraction: skips decoding embedded image data, which the
+# segmenter never looks at (images are pulled separately via get_images).
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+def compact_page(page, size_counts=None):
+    """Reduces a page's span dict to a list of blocks of (size, text, bbox, flags) lines.
+
+    `size` is the rounded max span size of the line, `text` the joined,
+    stripped span text and `flags` the MONO/BOLD bits shared by all of its
+    non-blank spans; blank lines and blocks are dropped. Span sizes and
+    flags are gathered into arrays once per page and reduced per line with
+    NumPy. Blocks come in reading order (see layout.reading_order), so
+    multi-column pages are read column by column. If `size_counts` is
+    given, every span size is tallied into it so the font histogram is
+    built in the same pass.
+    """
+    raw = [b for b in page.get_text("dict", flags=TEXT_FLAGS)["blocks"] if "lines" in b]
+    owners = [k for k, b in enumerate(raw) for l in b["lines"] if l["spans"]]
+    lines = [l for b in raw for l in b["lines"] if l["spans"]]
+    if not lines:
+        return []
+    spans = [s for l in lines for s in l["spans"]]
+    starts = np.cumsum([0] + [len(l["spans"]) for l in lines[:-1]])
+    sizes = np.round(np.fromiter([s["size"] for s in spans], dtype=float, count=len(spans)), 1)
+    # Blank spans (-1: every bit set) don't clear a line's shared flags
+    flags = np.fromiter([s["flags"] if s["text"].strip() else -1 for s in spans], dtype=np.int64, count=len(spans))
+    if size_counts is not None:
+        values, counts = np.unique(sizes, return_counts=True)
+        size_counts.update(dict(zip(values.tolist(), counts.tolist())))
+    line_sizes = np.maximum.reduceat(sizes, starts).tolist()
+    line_flags = (np.bitwise_and.reduceat(flags, starts) & (MONO | BOLD)).tolist()
+
+    blocks = [[] for _ in raw]
+    for k, l in enumerate(lines):
+        text = "".join([s["text"] for s in l["spans"]]).strip()
+        if text:
+            blocks[owners[k]].append((line_sizes[k], text, tuple(l["bbox"]), line_flags[k]))
+    boxes = [b["bbox"] for b, lines in zip(raw, blocks) if lines]
+    blocks = [lines for lines in blocks if lines]
+    order = reading_order(boxes, [len(lines) for lines in blocks], page.rect.width)
+    if order is not None:
+        blocks = [blocks[k] for k in order]
+    return blocks
+
+
+class PageStore:
+    """Holds compact page records between the scan and segmentation passes.
+
+    By default records stay in memory. With `stream=True` they are pickled to
+    an anonymous temp file as they arrive and replayed one page at a time, so
+    memory stays bounded by a single page on very large books.
+    """
+
+    def __init__(self, stream=False):
+        self.stream = stream
+        self.count = 0
+        self._pages = []
+        self._spill = tempfile.TemporaryFile() if stream else None
+
+    def append(self, record):
+        if self._spill is not None:
+            pickle.dump(record, self._spill, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            self._pages.append(record)
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        if self._spill is None:
+            yield from self._pages
+            return
+        self._spill.seek(0)
+        for _ in range(self.count):
+            yield pickle.load(self._spill)
+
+    def close(self):
+        self._pages = []
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
@@ -0,0 +1,42 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Shards smaller than this cost more in process overhead than they save
+MIN_SHARD_PAGES = 32
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def page_shards(page_count, workers, min_pages=MIN_SHARD_PAGES):
+    """Splits pages [0, page_count) into contiguous (start, stop) ranges.
+
+    At most `workers` shards are produced and none is smaller than
+    `min_pages` (except when the whole book is), so short books stay whole.
+    """
+    if page_count <= 0:
+        return [(0, 0)]
+    count = max(1, min(workers, page_count // min_pages))
+    size, extra = divmod(page_count, count)
+    shards = []
+    start = 0
+    for k in range(count):
+        stop = start + size + (1 if k < extra else 0)
+        shards.append((start, stop))
+        start = stop
+    return shards
+
+
+def pool_map(fn, jobs, workers):
+    """Runs fn(*job) for every job, in a process pool when workers > 1.
+
+    Results come back in job order, so callers can merge them exactly as a
+    serial run would have produced them.
+    """
+    jobs = list(jobs)
+    if workers <= 1 or len(jobs) <= 1:
+        return [fn(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = [pool.submit(fn, *job) for job in jobs]
+        return [f.result() for f in futures]
@@ -0,0 +1,106 @@
+import io
+import importlib.util
+import multiprocessing
+from collections import Counter
+
+import fitz  # PyMuPDF
+
+from font_stats import heading_thresholds
+from page_cache import compact_page
+from parallel import page_shards
+from pdf_buffer import shared_document
+
+# Small shards keep a pathological page from costing more than a few pages
+SHARD_PAGES = 24
+
+
+def require_unstructured():
+    """Raises ImportError unless unstructured is installed, instead of every
+    shard quietly falling back to block_elements."""
+    if importlib.util.find_spec("unstructured") is None:
+        raise ImportError("the unstructured backend needs the unstructured package "
+                          "(pip install 'unstructured[pdf]')", name="unstructured")
+
+
+def partition_range(pdf_path, start, stop, strategy="fast"):
+    """partition_pdf over pages [start, stop) only, as (category, text) pairs.
+
+    The page range is copied into an in-memory sub-document, so unstructured
+    never parses the rest of the book.
+    """
+    from unstructured.partition.pdf import partition_pdf
+
+    part = fitz.open()
+    part.insert_pdf(shared_document(pdf_path), from_page=start, to_page=stop - 1)
+    data = part.tobytes()
+    part.close()
+    elements = partition_pdf(file=io.BytesIO(data), strategy=strategy)
+    return [(el.category, str(el).strip()) for el in elements]
+
+
+def block_elements(pdf_path, start, stop):
+    """PyMuPDF stand-in for partition_range.
+
+    Lines at or above the range's H2 font size become "Title" elements and
+    the rest of each text block one "NarrativeText" element.
+    """
+    size_counts = Counter()
+    doc = shared_document(pdf_path)
+    pages = [compact_page(doc.load_page(i), size_counts) for i in range(start, stop)]
+    h2_size = heading_thresholds(size_counts)[2]
+    elements = []
+    for blocks in pages:
+        for lines in blocks:
+            body = []
+            for size, text, *_ in lines:
+                if size >= h2_size and len(text) < 100:
+                    if body:
+                        elements.append(("NarrativeText", " ".join(body)))
+                        body = []
+                    elements.append(("Title", text))
+                else:
+                    body.append(text)
+            if body:
+                elements.append(("NarrativeText", " ".join(body)))
+    return elements
+
+
+def iter_elements(pdf_path, page_count, workers=1, timeout=120, metrics=None):
+    """Yields (category, text) elements for the whole book in page order.
+
+    Page-range shards are partitioned in a process pool, so each shard can
+    be given up on: a shard that raises, or is not back `timeout` seconds
+    after the previous one, is redone with block_elements. A timed-out
+    pool is terminated (killing the stuck worker) and the unfinished
+    shards are resubmitted to a fresh one. Elements of each shard are
+    yielded as soon as it and all earlier shards are done.
+    """
+    require_unstructured()
+    shards = page_shards(page_count, max(1, page_count // SHARD_PAGES), min_pages=SHARD_PAGES)
+    pool = multiprocessing.Pool(max(1, workers))
+    pending = {k: pool.apply_async(partition_range, (pdf_path, *shard)) for k, shard in enumerate(shards)}
+    try:
+        for k, (start, stop) in enumerate(shards):
+            try:
+                elements = pending.pop(k).get(timeout)
+            except multiprocessing.TimeoutError:
+                print(f"   Pages {start}-{stop - 1} timed out after {timeout}s, using PyMuPDF blocks")
+                if metrics is not None:
+                    metrics.count("shard_timeouts")
+                done = {j: r for j, r in pending.items() if r.ready()}
+                pool.terminate()
+                pool = multiprocessing.Pool(max(1, workers))
+                pending = {j: done.get(j) or pool.apply_async(partition_range, (pdf_path, *shards[j]))
+                           for j in pending}
+                elements = block_elements(pdf_path, start, stop)
+            except Exception as e:
+                print(f"   Pages {start}-{stop - 1} failed to partition ({e}), using PyMuPDF blocks")
+                if metrics is not None:
+                    metrics.count("shard_errors")
+                elements = block_elements(pdf_path, start, stop)
+            if metrics is not None:
+                metrics.count("shards")
+                metrics.count("elements", len(elements))
+            yield from elements
+    finally:
+        pool.terminate()
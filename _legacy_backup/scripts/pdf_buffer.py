@@ -0,0 +1,85 @@
+import os
+import mmap
+
+import fitz  # PyMuPDF
+
+# Documents kept open per process by shared_document()
+MAX_SHARED_DOCS = 2
+# Files kept mapped per process by pdf_view()
+MAX_VIEWS = 4
+
+_views = {}
+_docs = {}
+_docs_pid = None
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def pdf_view(path):
+    """Read-only, zero-copy view of a PDF's bytes, memory-mapped once per process.
+
+    Every document opened on a view reads straight from the mapping, so
+    the file is read from disk once and its pages sit in the OS page cache
+    shared by all processes (forked workers also inherit the mapping).
+    A changed file (size or mtime) is mapped again; beyond MAX_VIEWS files
+    the oldest mapping is dropped. Each call returns its own memoryview, so
+    a mapping is never closed under a document still reading from it.
+    """
+    path = os.path.abspath(path)
+    stamp = _stamp(path)
+    entry = _views.get(path)
+    if entry is None or entry[0] != stamp:
+        if entry is not None:
+            _unmap(_views.pop(path))
+        while len(_views) >= MAX_VIEWS:
+            _unmap(_views.pop(next(iter(_views))))
+        with open(path, 'rb') as f:
+            entry = _views[path] = (stamp, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    return memoryview(entry[1])
+
+
+def _unmap(entry):
+    """Closes a dropped mapping, or, while views of it are still alive
+    (their memoryviews pin it), leaves it to be unmapped with the last one."""
+    try:
+        entry[1].close()
+    except BufferError:
+        pass
+
+
+def open_pdf(path):
+    """fitz.open(path), backed by the shared mapping instead of its own reads."""
+    if os.path.getsize(path) == 0:
+        return fitz.open(path)  # mmap can't map an empty file; let fitz raise
+    return fitz.open(stream=pdf_view(path), filetype="pdf")
+
+
+def shared_document(path):
+    """An open document for `path` that stays open for reuse in this process.
+
+    For worker functions that are called many times on the same book (page
+    shards): the xref table is parsed once per process instead of once per
+    call. Callers must not close it; PyMuPDF documents are not thread-safe,
+    so only use it from one thread.
+    """
+    global _docs_pid
+    if _docs_pid != os.getpid():
+        # Inherited through fork: the parent's documents are not ours to use
+        _docs.clear()
+        _docs_pid = os.getpid()
+    path = os.path.abspath(path)
+    stamp = _stamp(path)
+    entry = _docs.get(path)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    if entry is not None:
+        entry[1].close()
+        del _docs[path]
+    while len(_docs) >= MAX_SHARED_DOCS:
+        _docs.pop(next(iter(_docs)))[1].close()
+    doc = open_pdf(path)
+    _docs[path] = (stamp, doc)
+    return doc
@@ -0,0 +1,254 @@
+import os
+import argparse
+import importlib.util
+
+import config
+from build_manifest import BuildManifest, default_manifest_path, file_hash
+from checkpoint import add_resume_argument, book_checkpoint
+from metrics import Metrics, add_arguments, from_args
+from topic_index import TopicIndex
+
+BACKENDS = ("heuristic", "unstructured", "llm")
+MODES = BACKENDS + ("auto",)
+# Tried in order when auto mode rejects the heuristic result
+FALLBACKS = ("unstructured", "llm")
+
+
+def segmentation_quality(entries, pages):
+    """Why heuristic topics look unusable for a book of `pages` pages, or None.
+
+    Flags books that produced no topics, far too few topics for their
+    length, one topic holding most of the text (headings were not found),
+    or mostly tiny fragments (body text mistaken for headings).
+    """
+    words = [e.get("wordCount", 0) for e in entries]
+    total = sum(words)
+    if not total:
+        return "no topics"
+    if pages >= 40 and len(entries) < max(3, pages // 60):
+        return f"only {len(entries)} topics for {pages} pages"
+    if pages >= 40 and max(words) > 0.6 * total:
+        return f"one topic holds {max(words) * 100 // total}% of the text"
+    if len(entries) > 4 and sum(1 for w in words if w < 60) > len(entries) / 2:
+        return f"{sum(1 for w in words if w < 60)} of {len(entries)} topics are fragments"
+    return None
+
+
+class Pipeline:
+    """One entry point over the three extraction backends.
+
+    - heuristic: ElitePDFExtractor (font sizes; fast, no dependencies)
+    - unstructured: AdvancedExtractor (unstructured's partition_pdf)
+    - llm: chunked Gemini conversion from process_pdf
+    - auto: heuristic first; if segmentation_quality() rejects the result,
+      the first available fallback backend redoes the book.
+
+    `overrides` maps a PDF file name to the mode used for that book. Books
+    are recorded in the build manifest, so unchanged books are skipped and
+    outputs a book no longer produces are removed. Backends are imported
+    on first use, so a run only loads the libraries its books need. The
+    heuristic and llm backends checkpoint their progress; with `resume`
+    an interrupted book continues where it stopped.
+    """
+
+    def __init__(self, book_dir=config.BOOK_DIR, output_dir=config.OUTPUT_DIR, assets_dir=config.ASSETS_DIR,
+                 mode="auto", overrides=None, chunk_tokens=4000, use_cache=True, metrics=None,
+                 resume=False, **elite_options):
+        self.book_dir = book_dir
+        self.output_dir = output_dir
+        self.assets_dir = assets_dir
+        self.mode = mode
+        self.overrides = overrides or {}
+        self.chunk_tokens = chunk_tokens
+        self.use_cache = use_cache
+        self.metrics = metrics or Metrics()
+        self.resume = resume
+        self.elite_options = elite_options
+        # Checkpoints of the book being built, cleared once it is recorded
+        self.checkpoints = []
+        self._elite = None
+        self._advanced = None
+
+    @property
+    def elite(self):
+        if self._elite is None:
+            from elite_pdf_extractor import ElitePDFExtractor
+
+            self._elite = ElitePDFExtractor(self.book_dir, self.output_dir, self.assets_dir, metrics=self.metrics,
+                                            resume=self.resume, **self.elite_options)
+        return self._elite
+
+    def available(self, backend):
+        if backend == "unstructured":
+            return importlib.util.find_spec("unstructured") is not None
+        if backend == "llm":
+            return bool(config.gemini_key()) and importlib.util.find_spec("aiohttp") is not None
+        return True
+
+    def settings(self, mode):
+        """Manifest settings: a book is rebuilt when any of these change."""
+        settings = {"pipeline": 3, "mode": mode}
+        if mode in ("heuristic", "auto"):
+            settings["heuristic"] = self.elite.settings
+        if mode in ("llm", "auto"):
+            from process_pdf import checkpoint_settings
+
+            # The prompt and the models that may answer, besides chunk_tokens
+            settings["llm"] = checkpoint_settings(self.chunk_tokens)
+        return settings
+
+    def run_heuristic(self, filename, manifest, digest, settings):
+        checkpoint = self.elite.book_checkpoint(filename, digest)
+        self.checkpoints.append(checkpoint)
+        return self.elite.process_pdf(filename, layout=manifest.layout(filename, digest, settings),
+                                      checkpoint=checkpoint)
+
+    def run_unstructured(self, filename):
+        if self._advanced is None:
+            from advanced_extractor import AdvancedExtractor
+
+            self._advanced = AdvancedExtractor(self.book_dir, self.output_dir, self.assets_dir, metrics=self.metrics)
+        return self._advanced.process_pdf(filename)
+
+    def run_llm(self, filename, digest):
+        import asyncio
+
+        from llm_cache import ResponseCache
+        from list_models import ModelRegistry
+        from llm_client import GeminiClient
+        from process_pdf import checkpoint_settings, convert_book
+        from text_extract import extract_text
+
+        path = os.path.join(self.book_dir, filename)
+        checkpoint = book_checkpoint("llm", path, checkpoint_settings(self.chunk_tokens),
+                                     self.resume, digest=digest)
+        self.checkpoints.append(checkpoint)
+        if checkpoint.finished() is not None:
+            print(f"Already converted by the interrupted run: {filename}")
+            return checkpoint.finished()
+
+        with self.metrics.stage("extraction", book=filename):
+            text = extract_text(path)
+
+        async def convert(cache):
+            async with GeminiClient.from_env(config.gemini_key(), metrics=self.metrics,
+                                             registry=ModelRegistry()) as client:
+                return await convert_book(client, cache, filename, text, self.chunk_tokens, self.metrics,
+                                          output_dir=self.output_dir, checkpoint=checkpoint)
+
+        cache = ResponseCache() if self.use_cache else None
+        try:
+            return asyncio.run(convert(cache))
+        finally:
+            if cache is not None:
+                self.metrics.count("cache_hits", cache.hits)
+                self.metrics.count("cache_misses", cache.misses)
+                cache.close()
+
+    def run_backend(self, backend, filename, digest):
+        """(entries, outputs) from the unstructured or llm backend, or None."""
+        return self.run_unstructured(filename) if backend == "unstructured" else self.run_llm(filename, digest)
+
+    def process(self, filename, mode, manifest, digest, settings):
+        """Builds one book; returns (backend_used, entries, outputs, layout) or None."""
+        if mode not in ("heuristic", "auto"):
+            result = self.run_backend(mode, filename, digest)
+            return result and (mode, *result, None)
+
+        entries, outputs, layout = self.run_heuristic(filename, manifest, digest, settings)
+        if mode == "heuristic":
+            return "heuristic", entries, outputs, layout
+        from text_extract import page_count
+
+        problem = segmentation_quality(entries, page_count(os.path.join(self.book_dir, filename)))
+        if problem is None:
+            return "heuristic", entries, outputs, layout
+        for backend in FALLBACKS:
+            if not self.available(backend):
+                continue
+            print(f"Heuristic segmentation looks poor ({problem}), retrying with {backend}")
+            self.metrics.count("fallbacks")
+            result = self.run_backend(backend, filename, digest)
+            if result is not None:
+                # The heuristic attempt's files go, except any the fallback rewrote
+                manifest.discard(set(outputs) - set(result[1]))
+                return (backend, *result, layout)
+        print(f"Heuristic segmentation looks poor ({problem}); no fallback succeeded, keeping it")
+        return "heuristic", entries, outputs, layout
+
+    def run(self, books=None, force=False):
+        files = config.discover_books(self.book_dir)
+        manifest = BuildManifest(default_manifest_path(self.output_dir))
+        index = TopicIndex(self.output_dir)
+        for removed in manifest.prune(files):
+            index.drop_book(removed)
+
+        for f in books or files:
+            mode = self.overrides.get(f, self.mode)
+            if mode != "auto" and not self.available(mode):
+                print(f"Backend {mode} is not available (missing dependency or API key), skipping: {f}")
+                continue
+            digest = file_hash(os.path.join(self.book_dir, f))
+            settings = self.settings(mode)
+            if not force and manifest.is_current(f, digest, settings):
+                print(f"Unchanged, skipping: {f}")
+                self.metrics.count("books_skipped")
+                continue
+
+            print(f"\n--- PROCESSING: {f} ({mode}) ---")
+            self.checkpoints = []
+            with self.metrics.stage("book", book=f, mode=mode):
+                result = self.process(f, mode, manifest, digest, settings)
+            if result is None:
+                print(f"No output for {f}; keeping the previous build")
+                self.metrics.count("books_failed")
+                for checkpoint in self.checkpoints:
+                    checkpoint.close()
+                continue
+            backend, entries, outputs, layout = result
+            self.metrics.count(f"books_{backend}")
+            index.replace_book(f, entries)
+            index.save()
+            manifest.record(f, digest, settings, outputs, layout)
+            manifest.save()
+            for checkpoint in self.checkpoints:
+                checkpoint.clear()
+
+        index.save()
+        manifest.save()
+        self.metrics.summary()
+
+
+def parse_override(value):
+    book, _, mode = value.rpartition("=")
+    if not book or mode not in MODES:
+        raise argparse.ArgumentTypeError(f"expected BOOK.pdf=MODE with MODE one of {', '.join(MODES)}")
+    return book, mode
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Turn PDF books into tutorial modules with a selectable backend.")
+    parser.add_argument("--backend", choices=MODES, default="auto", help="backend for every book (auto: heuristic, falling back where it segments poorly)")
+    parser.add_argument("--book-backend", type=parse_override, action="append", default=[], metavar="BOOK.pdf=MODE",
+                        help="backend for one book; may be repeated")
+    parser.add_argument("--books", nargs="+", help="only these PDF files (default: every PDF in the book folder)")
+    parser.add_argument("--book-dir", default=config.BOOK_DIR)
+    parser.add_argument("--output-dir", default=config.OUTPUT_DIR)
+    parser.add_argument("--assets-dir", default=config.ASSETS_DIR)
+    parser.add_argument("--chunk-tokens", type=int, default=4000, help="token budget per chunk sent to the model")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and don't update the on-disk response cache")
+    parser.add_argument("--image-format", choices=["webp", "png"], default="webp", help="encoding for extracted images")
+    parser.add_argument("--sample-fonts", action="store_true", help="estimate heading sizes from a page sample instead of every page (faster, may miss rare sizes)")
+    parser.add_argument("--force", action="store_true", help="rebuild every book, even if unchanged since the last run")
+    add_resume_argument(parser)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    pipeline = Pipeline(args.book_dir, args.output_dir, args.assets_dir, mode=args.backend,
+                        overrides=dict(args.book_backend), chunk_tokens=args.chunk_tokens,
+                        use_cache=not args.no_cache, metrics=from_args(args), resume=args.resume,
+                        image_format=args.image_format, sample_fonts=args.sample_fonts)
+    try:
+        pipeline.run(books=args.books, force=args.force)
+    finally:
+        pipeline.metrics.close()
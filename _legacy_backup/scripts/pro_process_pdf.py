@@ -1,103 +1,123 @@
 import os
-import json
-import requests
-import time
-import fitz  # PyMuPDF
-from dotenv import load_dotenv
-
-# Manually load environment variables to avoid dotenv issues
-env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-print(f"Loading .env from: {env_path}")
-
-try:
-    with open(env_path, 'r', encoding='utf-8-sig') as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            if '=' in line:
-                key, value = line.split('=', 1)
-                os.environ[key.strip()] = value.strip().strip('"').strip("'")
-except Exception as e:
-    print(f"Error reading .env: {e}")
-
-# Configuration
-GEMINI_KEY = os.getenv("VITE_GEMINI_API_KEY")
-HF_TOKEN = os.getenv("HUGGINGFACE_TOKEN") # Optional fallback
-if GEMINI_KEY:
-    print(f"Key loaded: {GEMINI_KEY[:5]}...{GEMINI_KEY[-5:]}")
+import argparse
+import asyncio
+import hashlib
+
+import config
+from checkpoint import add_resume_argument, book_checkpoint
+from chunking import chunk_context, convert_book_text, index_books
+from llm_cache import ResponseCache, cached_generate
+from llm_client import GeminiClient, LLMError, clean_json_reply
+from list_models import ModelRegistry
+from metrics import Metrics, add_arguments, from_args
+from text_extract import extract_text, page_count
 
 class ProPDFConverter:
-    def __init__(self):
-        # Use exact model names from list_models.py
-        self.gemini_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-flash-latest:generateContent?key={GEMINI_KEY}"
+    def __init__(self, metrics=None, resume=False):
+        self.metrics = metrics or Metrics()
+        # Continue books from the checkpoints of an interrupted run
+        self.resume = resume
+        # Each chunk goes to the fastest healthy model in the registry
+        # (list_models.py), failing over to the next one on errors
+        self.client = GeminiClient.from_env(config.gemini_key(), timeout=30, metrics=self.metrics,
+                                            registry=ModelRegistry())
+        self.hf_token = config.hf_token()  # Optional fallback
         self.hf_url = "https://api-inference.huggingface.co/models/Qwen/Qwen2.5-Coder-32B-Instruct"
+        # Token budget per chunk; the whole book is converted chunk by chunk
+        self.chunk_tokens = 4000
+        # Set to a ResponseCache for the duration of process_all
+        self.cache = None
         
-    def extract_with_layout(self, pdf_path):
+    def extract_with_layout(self, pdf_path, workers=1):
         """Extracts text preserving blocks and basic structure."""
-        doc = fitz.open(pdf_path)
-        blocks = []
-        print(f"Analyzing {len(doc)} pages for layout...")
-        
-        for page in doc:
-            # Extract text as blocks (preserves some layout info)
-            text_blocks = page.get_text("blocks")
-            for b in text_blocks:
-                # b = (x0, y0, x1, y1, "text", block_no, block_type)
-                content = b[4].strip()
-                if content:
-                    blocks.append(content)
-        
-        return "\n\n".join(blocks)
-
-    def call_ai(self, prompt, text_chunk):
-        """Tries Gemini first, falls back to HF Inference."""
-        payload = {
-            "contents": [{
-                "parts": [{"text": f"{prompt}\n\nDATA:\n{text_chunk[:15000]}"}]
-            }]
-        }
-        
+        print(f"Analyzing {page_count(pdf_path)} pages for layout...")
+        # Text blocks (preserves some layout info), read page by page
+        return extract_text(pdf_path, mode="blocks", workers=workers, separator="\n\n")
+
+    async def call_ai(self, prompt, text_chunk):
+        """Tries Gemini first, falls back to HF Inference.
+
+        The client already fails over between Gemini models; HF is only
+        asked once all of them failed with quota, server or network
+        errors. Definite failures return None; if the fallback cannot
+        cover a chunk either, the LLMError is raised so the chunk stays
+        pending for a resumed run.
+        """
         # Try Gemini
         try:
             print("Requesting Intelligence from Pulse Core (Gemini)...")
-            res = requests.post(self.gemini_url, json=payload, timeout=30)
-            if res.status_code == 200:
-                raw_text = res.json()['candidates'][0]['content']['parts'][0]['text']
-                return self.clean_json(raw_text)
-            else:
-                print(f"Gemini Limit Hit: {res.status_code} - {res.text}")
+            return await cached_generate(self.client, self.cache, f"{prompt}\n\nDATA:\n", text_chunk,
+                                         parse=clean_json_reply)
+        except LLMError as e:
+            if not e.retryable:
+                print(f"Gemini rejected the chunk: {e}")
                 return None
-        except:
-            print("Primary Node Downtime. Switching to Fallback...")
+            print(f"Every Gemini model is unavailable ({e}). Switching to Fallback...")
+            self.metrics.count("fallbacks")
+            error = e
 
         # Fallback to HF (If token exists)
-        if HF_TOKEN:
-            headers = {"Authorization": f"Bearer {HF_TOKEN}"}
-            hf_payload = {"inputs": f"<|begin_of_text|><|start_header_id|>system<|end_header_id|>\nYou are an AI tutorial builder. Output raw JSON matching the requested structure.<|eot_id|><|start_header_id|>user<|end_header_id|>\n{prompt}\n{text_chunk[:10000]}<|eot_id|><|start_header_id|>assistant<|end_header_id|>"}
+        if self.hf_token:
+            import requests
+
+            headers = {"Authorization": f"Bearer {self.hf_token}"}
+            # The whole chunk: chunk_tokens already keeps it within the model's context
+            hf_payload = {"inputs": f"<|begin_of_text|><|start_header_id|>system<|end_header_id|>\nYou are an AI tutorial builder. Output raw JSON matching the requested structure.<|eot_id|><|start_header_id|>user<|end_header_id|>\n{prompt}\n{text_chunk}<|eot_id|><|start_header_id|>assistant<|end_header_id|>",
+                          "parameters": {"return_full_text": False, "max_new_tokens": 4096}}
             try:
-                res = requests.post(self.hf_url, headers=headers, json=hf_payload, timeout=60)
-                # Note: HF response format varies by model, usually list of dicts or raw text
-                # This is simplified for the demo
-                return {"title": "Error", "content": "HF Parsing not implemented yet"}
+                res = await asyncio.to_thread(requests.post, self.hf_url, headers=headers, json=hf_payload, timeout=60)
+                res.raise_for_status()
+                # Text generation answers [{"generated_text": ...}]
+                reply = res.json()
+                data = self.clean_json(reply[0]["generated_text"] if isinstance(reply, list) else reply["generated_text"])
+                if data:
+                    return data
+                print("Fallback reply was not valid JSON")
             except Exception as e:
                 print(f"Fallback failed: {e}")
         
-        return None
+        raise error
 
     def clean_json(self, text):
         try:
-            cleaned = text.replace('```json', '').replace('```', '').strip()
-            return json.loads(cleaned)
+            return clean_json_reply(text)
         except:
             return None
 
+    def checkpoint_settings(self, prompt):
+        """What a book's checkpoint is tied to, besides the PDF itself (and
+        every model the client may route chunks to)."""
+        return {"prompt": hashlib.sha256(prompt.encode('utf-8')).hexdigest(), "models": self.client.models(),
+                "chunk_tokens": self.chunk_tokens}
+
+    async def convert(self, prompt, f, text, output_dir, checkpoint=None):
+        """Converts one book's text; returns (index_entries, output_paths) or None.
+
+        See chunking.convert_book_text for how a BookCheckpoint is used.
+        """
+        async def convert_chunk(chunk, book_title):
+            return await self.call_ai(prompt + chunk_context(chunk, book_title), chunk["text"])
+
+        return await convert_book_text(f, text, convert_chunk, self.chunk_tokens, self.metrics, output_dir,
+                                       checkpoint)
+
+    async def convert_all(self, prompt, texts, output_dir, checkpoints=None):
+        # Rate limiting is left to the client's quota buckets (GEMINI_RPM /
+        # GEMINI_TPM), so books convert concurrently instead of after a nap.
+        checkpoints = checkpoints or {}
+        async with self.client:
+            results = await asyncio.gather(*(self.convert(prompt, f, text, output_dir, checkpoints.get(f))
+                                             for f, text in texts))
+        if self.client.retries:
+            print(f"NEURAL QUOTA RETRIES: {self.client.retries}")
+        index_books(output_dir, [f for f, _ in texts], results, checkpoints)
+
     def process_all(self):
-        pdf_dir = os.path.join(os.path.dirname(__file__), '..', 'src', 'assets', 'book')
-        output_dir = os.path.join(os.path.dirname(__file__), '..', 'src', 'data', 'generated_tutorials')
+        pdf_dir = config.BOOK_DIR
+        output_dir = config.OUTPUT_DIR
         os.makedirs(output_dir, exist_ok=True)
         
-        files = [f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf')]
+        files = config.discover_books(pdf_dir)
         print(f"PRO_PROCESSOR: Found {len(files)} entities in queue.")
 
         prompt = """
@@ -107,24 +127,41 @@ class ProPDFConverter:
         Structure JSON: {"title", "slug", "description", "tags":[], "content": "MARKDOWN"}
         """
 
+        settings = self.checkpoint_settings(prompt)
+        checkpoints = {f: book_checkpoint("pro", os.path.join(pdf_dir, f), settings, self.resume) for f in files}
+
+        # PyMuPDF is not thread-safe, so extraction stays sequential
+        self.metrics.count("books", len(files))
+        texts = []
         for f in files:
             path = os.path.join(pdf_dir, f)
+            if checkpoints[f].finished() is not None:
+                texts.append((f, None))  # finished by the interrupted run
+                continue
             print(f"\n--- INITIATING EXTRACTION: {f} ---")
-            text = self.extract_with_layout(path)
-            
-            # Rate limiting for Free Tier
-            print("CALIBRATING NEURAL QUOTA (30s delay)...")
-            time.sleep(30)
-            
-            data = self.call_ai(prompt, text)
-            if data and 'slug' in data:
-                out_path = os.path.join(output_dir, f"{data['slug']}.json")
-                with open(out_path, 'w', encoding='utf-8') as out_f:
-                    json.dump(data, out_f, indent=2)
-                print(f"ENTITY_STABILIZED: {data['title']} at {out_path}")
-            else:
-                print(f"CRITICAL_FAILURE: Could not process {f}")
+            with self.metrics.stage("extraction", book=f):
+                texts.append((f, self.extract_with_layout(path)))
+
+        self.cache = ResponseCache()
+        try:
+            with self.metrics.stage("generation"):
+                asyncio.run(self.convert_all(prompt, texts, output_dir, checkpoints))
+        finally:
+            for checkpoint in checkpoints.values():
+                checkpoint.close()
+            self.metrics.count("cache_hits", self.cache.hits)
+            self.metrics.count("cache_misses", self.cache.misses)
+            self.cache.close()
+            self.cache = None
+        self.metrics.summary()
 
 if __name__ == "__main__":
-    converter = ProPDFConverter()
-    converter.process_all()
+    parser = argparse.ArgumentParser(description="Convert PDF books into interactive modules with Gemini.")
+    add_resume_argument(parser)
+    add_arguments(parser)
+    args = parser.parse_args()
+    converter = ProPDFConverter(metrics=from_args(args), resume=args.resume)
+    try:
+        converter.process_all()
+    finally:
+        converter.metrics.close()
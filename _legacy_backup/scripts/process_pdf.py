@@ -1,58 +1,52 @@
 import os
 import sys
-import json
-import requests
-import time
-from pypdf import PdfReader
-from dotenv import load_dotenv
-
-# Manually load environment variables to avoid dotenv issues
-env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-print(f"Loading .env from: {env_path}")
-
-try:
-    with open(env_path, 'r', encoding='utf-8-sig') as f:
-        print("--- .env Content Start ---")
-        for line in f:
-            print(f"Read line: {repr(line)}")
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            if '=' in line:
-                key, value = line.split('=', 1)
-                os.environ[key.strip()] = value.strip().strip('"').strip("'")
-                if key.strip() == "VITE_GEMINI_API_KEY":
-                    print("Found VITE_GEMINI_API_KEY!")
-        print("--- .env Content End ---")
-except Exception as e:
-    print(f"Error reading .env: {e}")
-
-# Configuration
-API_KEY = os.getenv("VITE_GEMINI_API_KEY")
-
-if not API_KEY:
-    print("Error: VITE_GEMINI_API_KEY not found in .env file.")
-    sys.exit(1)
-
-GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-flash-latest:generateContent?key={API_KEY}"
-
-def extract_text_from_pdf(pdf_path):
-    """Extracts text from a PDF file."""
+import argparse
+import asyncio
+import hashlib
+
+import config
+from checkpoint import add_resume_argument, book_checkpoint
+from chunking import chunk_context, convert_book_text, index_books
+from llm_cache import ResponseCache, cached_generate
+from llm_client import GeminiClient, LLMError, clean_json_reply
+from list_models import ModelRegistry, candidate_models
+from metrics import Metrics, add_arguments, from_args
+from parallel import default_workers, page_shards, pool_map
+from text_extract import page_count, read_page_range
+
+def extract_page_range(pdf_path, start, stop):
+    """Extracts text from pages [start, stop) with its own document."""
     try:
-        reader = PdfReader(pdf_path)
-        text = ""
-        print(f"Reading {len(reader.pages)} pages...")
-        for i, page in enumerate(reader.pages):
-            text += page.extract_text() + "\n"
-        return text
+        return "".join(text + "\n" for text in read_page_range(pdf_path, start, stop))
     except Exception as e:
-        print(f"Error reading PDF: {e}")
+        print(f"Error reading {os.path.basename(pdf_path)} pages {start}-{stop - 1}: {e}")
         return None
 
-def generate_tutorial_content(text_chunk):
-    """Uses Gemini API via HTTP to convert text into a structured tutorial."""
-    
-    prompt = """
+def extract_texts(pdf_paths, workers=1):
+    """Extracts text from several PDFs, sharding pages across a process pool.
+
+    Returns {pdf_path: text}; a PDF is None if any of its shards failed.
+    """
+    jobs = []
+    for pdf_path in pdf_paths:
+        try:
+            pages = page_count(pdf_path)
+        except Exception as e:
+            print(f"Error reading PDF: {e}")
+            continue
+        print(f"Reading {pages} pages from {os.path.basename(pdf_path)}...")
+        jobs.extend((pdf_path, start, stop) for start, stop in page_shards(pages, workers))
+
+    parts = {}
+    for (pdf_path, _, _), text in zip(jobs, pool_map(extract_page_range, jobs, workers)):
+        parts.setdefault(pdf_path, []).append(text)
+    return {path: None if None in texts else "".join(texts) for path, texts in parts.items()}
+
+def extract_text_from_pdf(pdf_path, workers=1):
+    """Extracts text from a PDF file."""
+    return extract_texts([pdf_path], workers).get(pdf_path)
+
+TUTORIAL_PROMPT = """
     You are an elite technical content creator and senior developer. 
     Your task is to transform the provided raw technical notes (from a PDF) into a "Pro-Level", highly structured, and beautiful Markdown tutorial.
 
@@ -76,96 +70,115 @@ def generate_tutorial_content(text_chunk):
     
     **Input Data:**
     """
-    
-    # Payload
-    payload = {
-        "contents": [{
-            "parts": [{"text": prompt + text_chunk[:30000]}]  # Limit input context
-        }]
-    }
-    
-    headers = {'Content-Type': 'application/json'}
-    
+
+async def generate_tutorial_content(client, text_chunk, cache=None):
+    """Uses the Gemini API to convert text into a structured tutorial.
+
+    Replies that parse (and definite failures, unparseable replies among
+    them) are looked up in / stored to `cache`. Retryable failures (quota,
+    server, network) raise LLMError, so a checkpointed run leaves the chunk
+    pending.
+    """
     try:
-        print("Sending data to Gemini API...")
-        response = requests.post(GEMINI_API_URL, headers=headers, json=payload)
-        
-        if response.status_code != 200:
-            print(f"API Error: {response.status_code} - {response.text}")
-            return None
-            
-        result = response.json()
-        
-        # Extract response text
-        try:
-            generated_text = result['candidates'][0]['content']['parts'][0]['text']
-            # Clean up potential markdown formatting
-            generated_text = generated_text.replace('```json', '').replace('```', '').strip()
-            return json.loads(generated_text)
-        except (KeyError, IndexError, json.JSONDecodeError) as e:
-            print(f"Error parsing API response: {e}")
-            print(f"Raw response fragment: {str(result)[:500]}")
-            return None
-            
-    except Exception as e:
-        print(f"Network error: {e}")
+        return await cached_generate(client, cache, TUTORIAL_PROMPT, text_chunk, parse=clean_json_reply)
+    except LLMError as e:
+        print(f"{e}")
+        if e.retryable:
+            raise
         return None
 
-def main():
+def checkpoint_settings(chunk_tokens, models=None):
+    """What a convert_book checkpoint is tied to, besides the PDF itself.
+
+    Chunks are routed, so that is every model that may have answered them.
+    """
+    return {"prompt": hashlib.sha256(TUTORIAL_PROMPT.encode('utf-8')).hexdigest(),
+            "models": list(models or candidate_models()), "chunk_tokens": chunk_tokens}
+
+async def convert_book(client, cache, pdf_file, raw_text, chunk_tokens, metrics, output_dir=config.OUTPUT_DIR,
+                       checkpoint=None):
+    """Converts one book's text; returns (index_entries, output_paths) or None.
+
+    See chunking.convert_book_text for how a BookCheckpoint is used.
+    """
+    async def convert(chunk, book_title):
+        return await generate_tutorial_content(client, chunk_context(chunk, book_title) + chunk["text"], cache)
+
+    return await convert_book_text(pdf_file, raw_text, convert, chunk_tokens, metrics, output_dir, checkpoint)
+
+async def convert_books(pdf_dir, pdf_files, texts, chunk_tokens, cache=None, metrics=None, checkpoints=None):
+    # Books are converted concurrently; the client paces requests to the
+    # configured quota (GEMINI_RPM / GEMINI_TPM) instead of fixed sleeps
+    # and routes each chunk to the fastest healthy model (GEMINI_MODELS).
+    metrics = metrics or Metrics()
+    checkpoints = checkpoints or {}
+
+    async with GeminiClient.from_env(config.gemini_key(), metrics=metrics, registry=ModelRegistry()) as client:
+        results = await asyncio.gather(*(convert_book(client, cache, f, texts.get(os.path.join(pdf_dir, f)),
+                                                      chunk_tokens, metrics, checkpoint=checkpoints.get(f))
+                                         for f in pdf_files))
+        if client.retries:
+            print(f"API retries: {client.retries}")
+    index_books(config.OUTPUT_DIR, pdf_files, results, checkpoints)
+
+def main(workers=1, chunk_tokens=4000, use_cache=True, metrics=None, resume=False):
+    if not config.gemini_key():
+        print("Error: VITE_GEMINI_API_KEY not found in .env file.")
+        sys.exit(1)
+
     # Directory containing PDFs
-    pdf_dir = os.path.join(os.path.dirname(__file__), '..', 'src', 'assets', 'book')
+    pdf_dir = config.BOOK_DIR
     
     if not os.path.exists(pdf_dir):
         print(f"Error: Directory '{pdf_dir}' not found.")
         sys.exit(1)
 
     # Get all PDF files
-    pdf_files = [f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf')]
+    pdf_files = config.discover_books(pdf_dir)
     
     if not pdf_files:
         print(f"No PDF files found in {pdf_dir}")
         sys.exit(1)
 
     print(f"Found {len(pdf_files)} PDFs to process: {', '.join(pdf_files)}")
+    metrics = metrics or Metrics()
+    metrics.count("books", len(pdf_files))
 
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(pdf_dir, pdf_file)
-        print(f"\n==================================================")
-        print(f"Processing: {pdf_file}")
-        print(f"==================================================")
-        
-        raw_text = extract_text_from_pdf(pdf_path)
-        
-        if not raw_text:
-            print(f"Skipping {pdf_file} due to extraction failure.")
-            continue
+    settings = checkpoint_settings(chunk_tokens)
+    checkpoints = {f: book_checkpoint("llm", os.path.join(pdf_dir, f), settings, resume) for f in pdf_files}
+
+    # Extract every book up front so --workers can spread all page shards
+    # across the pool; books an interrupted run finished need no text
+    with metrics.stage("extraction"):
+        texts = extract_texts([os.path.join(pdf_dir, f) for f in pdf_files if checkpoints[f].finished() is None],
+                              workers)
+
+    cache = ResponseCache() if use_cache else None
+    try:
+        with metrics.stage("generation"):
+            asyncio.run(convert_books(pdf_dir, pdf_files, texts, chunk_tokens, cache, metrics, checkpoints))
+    finally:
+        if cache is not None:
+            metrics.count("cache_hits", cache.hits)
+            metrics.count("cache_misses", cache.misses)
+            cache.close()
+        for checkpoint in checkpoints.values():
+            checkpoint.close()
 
-        print(f"Extracted {len(raw_text)} characters from {pdf_file}. Generating content...")
-        
-        # Rate limit handling (Flash tier is more lenient)
-        print("Waiting 20s for API quota reset...")
-        time.sleep(20) 
-        
-        # Process first 15k chars as summary tutorial
-        tutorial_data = generate_tutorial_content(raw_text[:15000])
-        
-        if tutorial_data:
-            output_dir = os.path.join("src", "data", "generated_tutorials")
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Use safe slug or filename
-            filename = f"{tutorial_data.get('slug', pdf_file.replace('.pdf', '').lower())}.json"
-            output_path = os.path.join(output_dir, filename)
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(tutorial_data, f, indent=2)
-                
-            print(f"SUCCESS! Generated: {output_path}")
-            print(f"Title: {tutorial_data.get('title')}")
-        else:
-            print(f"Failed to generate tutorial for {pdf_file}")
-            
     print("\nBatch processing complete.")
+    metrics.summary()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Convert PDF books into tutorials with Gemini.")
+    parser.add_argument("--workers", type=int, default=1, help=f"worker processes for text extraction (this machine: {default_workers()})")
+    parser.add_argument("--chunk-tokens", type=int, default=4000, help="token budget per chunk sent to the model")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and don't update the on-disk response cache")
+    add_resume_argument(parser)
+    add_arguments(parser)
+    args = parser.parse_args()
+    metrics = from_args(args)
+    try:
+        main(workers=args.workers, chunk_tokens=args.chunk_tokens, use_cache=not args.no_cache, metrics=metrics,
+             resume=args.resume)
+    finally:
+        metrics.close()
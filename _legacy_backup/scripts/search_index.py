@@ -0,0 +1,391 @@
+import os
+import re
+import json
+import math
+import time
+import shutil
+import argparse
+import tempfile
+from collections import defaultdict
+from functools import lru_cache
+
+SEARCH_DIR = "search"
+MANIFEST_NAME = "manifest.json"
+SEARCH_VERSION = 1
+# Terms are sharded on their first characters; the client fetches one
+# shard per query term
+SHARD_PREFIX = 2
+
+# Bits of a posting's field mask
+TITLE, HEADING = 1, 2
+FIELD_BOOST = {TITLE: 3.0, HEADING: 1.5}
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+HEADING_RE = re.compile(r"^#{1,6}\s")
+# Image references and links carry file names, not prose
+NOISE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)|https?://\S+")
+PHRASE_RE = re.compile(r'"([^"]+)"')
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have if in into is it its of on or
+that the their then there these this to was were will with
+""".split())
+
+# Longest first; (suffix, replacement, minimum stem length left)
+SUFFIXES = (
+    ("ational", "ate", 2), ("ization", "ize", 2), ("fulness", "ful", 2), ("iveness", "ive", 2),
+    ("ousness", "ous", 2), ("tional", "tion", 2), ("ements", "", 3), ("ement", "", 3),
+    ("ments", "", 3), ("ment", "", 3), ("ness", "", 3), ("ing", "", 3), ("ies", "y", 2),
+    ("ied", "y", 2), ("ed", "", 3), ("ly", "", 3), ("es", "", 3), ("s", "", 3),
+)
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    """Light English suffix stripping (no dictionary; same rules on both
+    sides of a query, so only consistency matters)."""
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith(("ss", "us", "is")):
+        return word
+    for suffix, replacement, min_stem in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+            word = word[:-len(suffix)] + replacement
+            if suffix in ("ing", "ed") and len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]  # running -> run, stopped -> stop
+            break
+    return word
+
+
+def tokens(text):
+    """Lower-cased word tokens of `text`, stop words included (they keep positions honest)."""
+    return TOKEN_RE.findall(NOISE_RE.sub(" ", text).lower())
+
+
+def index_term(token):
+    """The stemmed term indexed for `token`, or None for stop words and noise."""
+    if token in STOPWORDS or (len(token) < 2 and not token.isdigit()):
+        return None
+    return stem(token)
+
+
+def shard_key(term):
+    key = term[:SHARD_PREFIX]
+    return key if key.isascii() and key.isalnum() else "_"
+
+
+def topic_terms(topic):
+    """({term: [field_mask, positions...]}, token_count) for one topic.
+
+    The token stream is the title followed by the content; positions count
+    every token, stop words included, so phrases can be matched.
+    """
+    postings = {}
+    pos = 0
+
+    def add(text, mask):
+        nonlocal pos
+        for token in tokens(text):
+            term = index_term(token)
+            if term is not None:
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = [0]
+                entry[0] |= mask
+                entry.append(pos)
+            pos += 1
+
+    add(topic.get("title", ""), TITLE)
+    for line in topic.get("content", "").splitlines():
+        add(line, HEADING if HEADING_RE.match(line) else 0)
+    return postings, pos
+
+
+def _delta(positions):
+    return [p - q for p, q in zip(positions, [0] + positions[:-1])]
+
+
+def _undelta(deltas):
+    out, pos = [], 0
+    for d in deltas:
+        pos += d
+        out.append(pos)
+    return out
+
+
+class SearchIndex:
+    """Prebuilt inverted index over topic titles, headings and text.
+
+    Lives in `<output_dir>/search/`: a manifest (documents, their token
+    counts, which shards each book touches) and one `<prefix>.json` shard
+    per term prefix mapping term -> {slug: [field_mask, position deltas...]}.
+    Terms are stemmed with stem(), so the client (src/utils/tutorialSearch.js)
+    must tokenize the same way. Books are replaced one at a time: only the
+    shards the old and new version of a book touch are loaded, and only
+    those whose postings actually changed are rewritten.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.dir = os.path.join(output_dir, SEARCH_DIR)
+        self.path = os.path.join(self.dir, MANIFEST_NAME)
+        self.docs = {}
+        self.books = {}
+        self._shards = {}
+        self._dirty = set()
+        self.shards_loaded = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == SEARCH_VERSION and data.get("prefix") == SHARD_PREFIX:
+                self.docs = data.get("docs", {})
+                self.books = data.get("books", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: rebuilding unreadable search index {self.path}: {e}")
+
+    def shard(self, key):
+        """Terms of one shard, read from disk on first use."""
+        if key not in self._shards:
+            try:
+                with open(os.path.join(self.dir, f"{key}.json"), 'r', encoding='utf-8') as f:
+                    self._shards[key] = json.load(f)
+                self.shards_loaded += 1
+            except FileNotFoundError:
+                self._shards[key] = {}
+        return self._shards[key]
+
+    def _update(self, slugs, keys, new):
+        """Replaces the postings of `slugs` in the shards `keys` with `new`
+        ({key: {term: {slug: posting}}}), marking only changed shards dirty."""
+        for key in keys:
+            shard = self.shard(key)
+            updated = {}
+            for term, postings in shard.items():
+                kept = {s: p for s, p in postings.items() if s not in slugs}
+                if kept:
+                    updated[term] = kept
+            for term, postings in new.get(key, {}).items():
+                updated.setdefault(term, {}).update(postings)
+            if updated != shard:
+                self._shards[key] = updated
+                self._dirty.add(key)
+
+    def drop_book(self, book):
+        self.replace_book(book, [])
+        self.books.pop(book or "", None)
+
+    def replace_book(self, book, topics):
+        """Re-indexes one book from its full topic dicts."""
+        book = book or ""
+        new, docs = defaultdict(dict), {}
+        for topic in topics:
+            slug = topic["slug"]
+            postings, length = topic_terms(topic)
+            for term, (mask, *positions) in postings.items():
+                new[shard_key(term)].setdefault(term, {})[slug] = [mask] + _delta(positions)
+            docs[slug] = {"title": topic.get("title", slug), "book": book, "length": length}
+        old = {s for s, d in self.docs.items() if d["book"] == book}
+        # Shards holding the old version, and those of books whose slugs this one takes over
+        owners = {self.docs[s]["book"] for s in docs if s in self.docs} | {book}
+        keys = {k for b in owners for k in self.books.get(b, [])} | set(new)
+        self._update(old | set(docs), keys, new)
+        for s in old:
+            del self.docs[s]
+        self.docs.update(docs)
+        self.books[book] = sorted(new)
+
+    def save(self):
+        """Writes the shards changed since loading, then the manifest; returns
+        how many shard files were rewritten (unchanged bytes are left alone)."""
+        os.makedirs(self.dir, exist_ok=True)
+        written = 0
+        for key in sorted(self._dirty):
+            path = os.path.join(self.dir, f"{key}.json")
+            shard = self._shards[key]
+            if not shard:
+                if os.path.exists(path):
+                    os.remove(path)
+                    written += 1
+                continue
+            written += _write_json(path, shard)
+        self._dirty.clear()
+        _write_json(self.path, {"version": SEARCH_VERSION, "prefix": SHARD_PREFIX,
+                                "docs": self.docs, "books": self.books})
+        return written
+
+    def reset(self):
+        """Forgets every document and removes the shard files."""
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.docs, self.books, self._shards, self._dirty = {}, {}, {}, set()
+
+    def postings(self, term):
+        """{slug: (field_mask, positions)} for one stemmed term."""
+        raw = self.shard(shard_key(term)).get(term, {})
+        return {slug: (p[0], _undelta(p[1:])) for slug, p in raw.items()}
+
+    def search(self, query, limit=10):
+        """Ranked topics for `query`, best first, as dicts with slug, title, book and score.
+
+        Words are scored with BM25, boosted where they occur in a title or
+        heading. A "quoted phrase" only matches topics containing its words
+        in order.
+        """
+        phrases = [tokens(p) for p in PHRASE_RE.findall(query)]
+        words = {t for t in map(index_term, tokens(query)) if t is not None}
+        if not words or not self.docs:
+            return []
+        postings = {t: self.postings(t) for t in words}
+        n = len(self.docs)
+        avg_len = sum(d["length"] for d in self.docs.values()) / n
+        scores = defaultdict(float)
+        for term, docs in postings.items():
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for slug, (mask, positions) in docs.items():
+                tf = len(positions)
+                norm = 1.2 * (0.25 + 0.75 * self.docs[slug]["length"] / avg_len)
+                boost = 1.0 + sum(b for bit, b in FIELD_BOOST.items() if mask & bit)
+                scores[slug] += idf * tf * 2.2 / (tf + norm) * boost
+        for phrase in phrases:
+            matched = self._phrase_docs(phrase, postings)
+            scores = {s: v for s, v in scores.items() if s in matched}
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+        return [{"slug": s, "title": self.docs[s]["title"], "book": self.docs[s]["book"] or None,
+                 "score": round(v, 4)} for s, v in ranked]
+
+    def _phrase_docs(self, phrase, postings):
+        """Slugs whose text holds the phrase's indexed words at the right offsets."""
+        parts = [(offset, index_term(t)) for offset, t in enumerate(phrase)]
+        parts = [(offset, t) for offset, t in parts if t is not None]
+        if not parts:
+            return set(self.docs)
+        lists = [(offset, postings[t] if t in postings else self.postings(t)) for offset, t in parts]
+        first_offset, first = lists[0]
+        found = set()
+        for slug, (_, positions) in first.items():
+            others = [(offset - first_offset, docs.get(slug)) for offset, docs in lists[1:]]
+            if any(entry is None for _, entry in others):
+                continue
+            others = [(delta, set(entry[1])) for delta, entry in others]
+            if any(all(p + delta in pos for delta, pos in others) for p in positions):
+                found.add(slug)
+        return found
+
+
+def _write_json(path, data):
+    """Writes `data` unless `path` already holds the same bytes; True if written."""
+    data = json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+def rebuild(output_dir, entries):
+    """Indexes every topic in `entries` (index entries with "book") from scratch."""
+    from topic_index import read_topics
+
+    index = SearchIndex(output_dir)
+    index.reset()
+    by_book = defaultdict(list)
+    for entry in entries:
+        by_book[entry.get("book") or ""].append(entry)
+    for book, book_entries in by_book.items():
+        index.replace_book(book, read_topics(output_dir, book_entries))
+    index.save()
+    return index
+
+
+def benchmark(output_dir, queries=None, limit=10):
+    """Times a full build, a one-book update and queries on a copy of `output_dir`."""
+    from topic_index import TopicIndex, read_topics
+
+    with tempfile.TemporaryDirectory() as work:
+        for name in os.listdir(output_dir):
+            if name.endswith('.json'):
+                shutil.copy(os.path.join(output_dir, name), work)
+        entries = list(TopicIndex(work, search=False, dedupe=False).entries.values())
+        # Unowned topics are grouped by slug prefix so there is a "book" to update
+        for e in entries:
+            e["book"] = e.get("book") or e["slug"].split("-")[0]
+        corpus_bytes = sum(os.path.getsize(os.path.join(work, f"{e['slug']}.json")) for e in entries)
+
+        t0 = time.perf_counter()
+        index = rebuild(work, entries)
+        build = time.perf_counter() - t0
+        shard_files = [f for f in os.listdir(index.dir) if f != MANIFEST_NAME]
+        index_bytes = sum(os.path.getsize(os.path.join(index.dir, f)) for f in os.listdir(index.dir))
+
+        book = max(index.books, key=lambda b: len(index.books[b]))
+        book_entries = [e for e in entries if e["book"] == book]
+        topics = read_topics(work, book_entries)
+        index = SearchIndex(work)
+        t0 = time.perf_counter()
+        index.replace_book(book, topics)
+        unchanged = index.save()
+        unchanged_time = time.perf_counter() - t0
+
+        # The same book with one topic edited
+        topics[0] = {**topics[0], "content": topics[0].get("content", "") + "\n\nAppended benchmark paragraph."}
+        index = SearchIndex(work)
+        t0 = time.perf_counter()
+        index.replace_book(book, topics)
+        rewritten = index.save()
+        update = time.perf_counter() - t0
+
+        if not queries:
+            queries = [" ".join(e["title"].split()[:2]) for e in entries if e["title"].strip()][:20]
+        cold, warm, loaded = [], [], []
+        for q in queries:
+            index = SearchIndex(work)
+            t0 = time.perf_counter()
+            index.search(q, limit)
+            cold.append(time.perf_counter() - t0)
+            loaded.append(index.shards_loaded)
+            t0 = time.perf_counter()
+            index.search(q, limit)
+            warm.append(time.perf_counter() - t0)
+
+    print(f"Corpus: {len(entries)} topics, {corpus_bytes / 1e6:.1f} MB")
+    print(f"Full build: {build:.2f}s -> {len(shard_files)} shards, {index_bytes / 1e6:.1f} MB")
+    print(f"Unchanged re-index of {book} ({len(book_entries)} topics): {unchanged_time:.2f}s, "
+          f"{unchanged} of {len(shard_files)} shards rewritten")
+    print(f"Update of {book} with one topic edited: {update:.2f}s, "
+          f"{rewritten} of {len(shard_files)} shards rewritten")
+    if queries:
+        print(f"Queries: {len(queries)}, cold {sum(cold) / len(cold) * 1000:.1f} ms, "
+              f"warm {sum(warm) / len(warm) * 1000:.1f} ms, "
+              f"{sum(loaded) / len(loaded):.1f} shards loaded per query")
+
+
+if __name__ == "__main__":
+    OUTPUT_DIR = os.path.join("src", "data", "generated_tutorials")
+    parser = argparse.ArgumentParser(description="Build, query or benchmark the tutorial search index.")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="re-index every topic listed in index.json")
+    query = sub.add_parser("query", help="print the best matching topics")
+    query.add_argument("text")
+    query.add_argument("--limit", type=int, default=10)
+    bench = sub.add_parser("bench", help="time build, one-book update and queries on a copy of the corpus")
+    bench.add_argument("queries", nargs="*")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from topic_index import TopicIndex
+
+        index = rebuild(args.output_dir, TopicIndex(args.output_dir, search=False, dedupe=False).entries.values())
+        print(f"Indexed {len(index.docs)} topics -> {index.dir}")
+    elif args.command == "query":
+        for hit in SearchIndex(args.output_dir).search(args.text, args.limit):
+            print(f"{hit['score']:>8.2f}  {hit['slug']:<50} {hit['title']}")
+    else:
+        benchmark(args.output_dir, args.queries)
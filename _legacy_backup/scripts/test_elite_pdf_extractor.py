@@ -0,0 +1,51 @@
+"""A book split into page shards over worker processes must segment exactly
+as it does in one serial pass.
+
+    python -m pytest test_elite_pdf_extractor.py
+"""
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("fitz")
+
+import config
+from elite_pdf_extractor import ElitePDFExtractor
+
+BOOK = os.path.join(config.BOOK_DIR, "thinkpython2.pdf")
+
+pytestmark = pytest.mark.skipif(not os.path.exists(BOOK), reason="bundled sample book missing")
+
+
+def build(root, workers, force=False, **options):
+    """Runs the extractor over the sample book into `root`; returns {file name: bytes} of the topics."""
+    books = os.path.join(root, "books")
+    if not os.path.exists(books):
+        os.makedirs(books)
+        shutil.copy(BOOK, books)
+    output_dir = os.path.join(root, "topics")
+    extractor = ElitePDFExtractor(books, output_dir, os.path.join(root, "images"),
+                                  checkpoint_dir=os.path.join(root, "checkpoints"), image_format="png", **options)
+    extractor.run(workers=workers, force=force)
+    topics = {}
+    for name in sorted(os.listdir(output_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(output_dir, name), "rb") as f:
+                topics[name] = f.read()
+    return topics
+
+
+@pytest.mark.parametrize("sample_fonts", [False, True])
+def test_sharded_run_matches_serial_run(tmp_path, sample_fonts):
+    serial = build(str(tmp_path / "serial"), 1, sample_fonts=sample_fonts)
+    sharded = build(str(tmp_path / "sharded"), 3, sample_fonts=sample_fonts)
+    assert len(serial) > 10
+    assert sharded == serial
+
+
+def test_rebuild_from_cached_layout_matches(tmp_path):
+    first = build(str(tmp_path / "book"), 1)
+    # Forced rebuilds take the heading sizes and running lines from the manifest
+    assert build(str(tmp_path / "book"), 1, force=True) == first
+    assert build(str(tmp_path / "book"), 3, force=True) == first
@@ -0,0 +1,168 @@
+"""GeminiClient against the local fake API (fake_gemini.py): retries,
+Retry-After, failover between models and the response cache.
+
+    python -m pytest test_llm_client.py
+"""
+import time
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from fake_gemini import FakeGemini
+from list_models import ModelRegistry
+from llm_cache import ResponseCache, cached_generate
+from llm_client import UNUSABLE_REPLY, GeminiClient, LLMError
+
+FAST = "gemini-flash-lite-latest"
+SLOW = "gemini-flash-latest"
+
+
+def run(models, test, registry=None, **options):
+    """Serves `models` and runs `test(fake, client)` with a client pointed at them."""
+    options = {"rpm": 100_000, "backoff": 0.01, "max_retries": 3, **options}
+
+    async def main():
+        async with FakeGemini(models, port=0) as fake:
+            async with GeminiClient("key", model=next(iter(models)), base_url=fake.base_url, registry=registry,
+                                    **options) as client:
+                return await test(fake, client)
+
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(str(tmp_path / "registry.json"), candidates=[SLOW, FAST])
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    yield cache
+    cache.close()
+
+
+def test_server_errors_are_retried():
+    async def test(fake, client):
+        reply = await client.generate("prompt")
+        assert "Converted by" in reply
+        assert fake.calls[SLOW] == 3
+        assert client.retries == 2
+
+    run({SLOW: {"latency": 0, "failures": 2}}, test)
+
+
+def test_429_waits_for_retry_after():
+    async def test(fake, client):
+        start = time.perf_counter()
+        await client.generate("prompt")
+        # Retry-After: 1, where the exponential backoff would wait 30 s
+        assert 0.9 < time.perf_counter() - start < 5
+        assert client.retries == 1
+
+    run({SLOW: {"latency": 0, "failures": 1, "status": 429}}, test, backoff=30)
+
+
+def test_retries_give_up_with_a_retryable_error():
+    async def test(fake, client):
+        with pytest.raises(LLMError) as error:
+            await client.generate("prompt")
+        assert error.value.status == 503 and error.value.retryable
+        assert fake.calls[SLOW] == 4
+
+    run({SLOW: {"latency": 0, "error_rate": 1}}, test)
+
+
+def test_failing_model_fails_over_without_backoff(registry):
+    async def test(fake, client):
+        model, reply = await client.generate_with_model("prompt")
+        assert model == FAST and reply
+        assert fake.calls[SLOW] == 1
+        assert client.retries == 0
+
+    run({SLOW: {"latency": 0, "error_rate": 1}, FAST: {"latency": 0}}, test, registry)
+    assert registry.stats[SLOW]["errors"] == 1
+
+
+def test_replies_are_cached_under_the_answering_model(registry, cache):
+    async def test(fake, client):
+        first = await cached_generate(client, cache, "template ", "chunk")
+        assert await cached_generate(client, cache, "template ", "chunk") == first
+        assert sum(fake.calls.values()) == 2  # the failed call, then the answer
+        assert cache.get([FAST], "template ", "chunk")[:2] == (FAST, True)
+        assert cache.get([SLOW], "template ", "chunk") is None
+
+    run({SLOW: {"latency": 0, "error_rate": 1}, FAST: {"latency": 0}}, test, registry)
+
+
+def test_blocked_reply_fails_once_and_is_cached(registry, cache):
+    async def test(fake, client):
+        for _ in range(2):
+            with pytest.raises(LLMError) as error:
+                await cached_generate(client, cache, "template ", "chunk")
+            assert error.value.status == UNUSABLE_REPLY and not error.value.retryable
+            assert error.value.model == SLOW
+        # Neither retried nor failed over, and answered from the cache the second time
+        assert fake.calls == {SLOW: 1, FAST: 0}
+        assert client.retries == 0
+
+    run({SLOW: {"latency": 0, "error_rate": 1, "status": 200}, FAST: {"latency": 0}}, test, registry)
+
+
+def test_unparseable_reply_is_cached_as_a_failure(registry, cache):
+    def parse(text):
+        raise ValueError("not a tutorial")
+
+    async def test(fake, client):
+        with pytest.raises(LLMError) as error:
+            await cached_generate(client, cache, "template ", "chunk", parse=parse)
+        assert error.value.status == UNUSABLE_REPLY and not error.value.retryable
+        model, ok, _, _ = cache.get([SLOW], "template ", "chunk")
+        assert (model, ok) == (SLOW, False)
+        # Once the short failure TTL is over, the model is asked again
+        cache.failure_ttl = 0
+        time.sleep(0.01)
+        assert await cached_generate(client, cache, "template ", "chunk", parse=len) > 0
+        assert fake.calls[SLOW] == 2
+
+    run({SLOW: {"latency": 0}}, test, registry)
+
+
+def test_no_candidate_model_fails_without_a_call(tmp_path):
+    empty = ModelRegistry(str(tmp_path / "registry.json"))
+    empty.candidates = []  # e.g. GEMINI_MODELS naming nothing usable
+
+    async def test(fake, client):
+        with pytest.raises(LLMError) as error:
+            await client.generate_with_model("prompt")
+        assert error.value.retryable
+        assert fake.calls[SLOW] == 0 and client.retries == 0
+
+    run({SLOW: {"latency": 0}}, test, empty)
+
+
+@pytest.mark.parametrize("reply", [{"text": "<html>proxy login</html>"}, {"text": "[]", "content_type": "application/json"}])
+def test_model_list_refresh_keeps_the_cached_list(registry, reply):
+    from aiohttp import ClientSession, web
+
+    async def list_models(request):
+        return web.Response(**reply)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/v1beta/models", list_models)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        port = runner.addresses[0][1]
+        try:
+            async with ClientSession() as session:
+                await registry.refresh(session, "key", f"http://127.0.0.1:{port}/v1beta", force=True)
+        finally:
+            await runner.cleanup()
+
+    registry.available = [FAST]
+    asyncio.run(main())
+    assert registry.available == [FAST]
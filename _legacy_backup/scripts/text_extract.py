@@ -0,0 +1,63 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from parallel import page_shards
+from pdf_buffer import open_pdf, shared_document
+
+
+def page_text(page, mode="text"):
+    """Plain text of a page, or its text blocks joined by blank lines ("blocks")."""
+    if mode == "blocks":
+        # b = (x0, y0, x1, y1, "text", block_no, block_type)
+        return "\n\n".join(b[4].strip() for b in page.get_text("blocks") if b[6] == 0 and b[4].strip())
+    return page.get_text("text")
+
+
+def page_count(path):
+    with open_pdf(path) as doc:
+        return len(doc)
+
+
+def read_page_range(path, start, stop, mode="text"):
+    """Texts of pages [start, stop), from this process's shared document."""
+    doc = shared_document(path)
+    return [page_text(doc.load_page(i), mode) for i in range(start, stop)]
+
+
+def iter_pages(path, mode="text", workers=1, max_chars=None):
+    """Yields (page_number, text) for a PDF in page order.
+
+    With workers > 1, page ranges are read ahead in a process pool (PyMuPDF
+    is not thread-safe, so the fan-out uses processes, each opening its own
+    document). Iteration stops once `max_chars` characters have been
+    yielded; read-ahead shards that have not started are cancelled.
+    """
+    total = 0
+    if workers <= 1:
+        with open_pdf(path) as doc:
+            for i in range(len(doc)):
+                text = page_text(doc.load_page(i), mode)
+                yield i, text
+                total += len(text)
+                if max_chars is not None and total >= max_chars:
+                    return
+        return
+
+    # Several small shards per worker so an early stop wastes little work
+    shards = page_shards(page_count(path), workers * 4, min_pages=8)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(read_page_range, path, start, stop, mode) for start, stop in shards]
+        try:
+            for (start, _), future in zip(shards, futures):
+                for offset, text in enumerate(future.result()):
+                    yield start + offset, text
+                    total += len(text)
+                    if max_chars is not None and total >= max_chars:
+                        return
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def extract_text(path, mode="text", workers=1, max_chars=None, separator="\n"):
+    """Whole-book text built from iter_pages, joined once at the end."""
+    return separator.join(text for _, text in iter_pages(path, mode, workers, max_chars))
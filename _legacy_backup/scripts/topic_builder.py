@@ -0,0 +1,107 @@
+import os
+import json
+
+from topic_index import RESERVED_SLUGS, index_entry
+
+
+def compact_json(obj):
+    """UTF-8 JSON without indentation or spaces after separators."""
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class TopicBuilder:
+    """Accumulates one topic at a time as a list of content fragments.
+
+    Fragments are joined once when the topic closes, instead of growing the
+    content string with += per line. Closed topics are handed to `on_close`
+    (e.g. a TopicWriter) right away, so memory is bounded by the largest
+    topic rather than the whole book. Topics whose stripped content is not
+    longer than `min_chars` are dropped.
+    """
+
+    def __init__(self, on_close, min_chars=0):
+        self.on_close = on_close
+        self.min_chars = min_chars
+        self.meta = None
+        self._parts = []
+        self._has_text = False
+
+    def start(self, meta):
+        """Closes the current topic and opens `meta`; meta["content"] is the opening text."""
+        self.close()
+        self.meta = meta
+        self._parts = []
+        self._has_text = False
+        self.write(meta.get("content", ""))
+
+    def write(self, text):
+        if text:
+            self._parts.append(text)
+            if not self._has_text and not text.isspace():
+                self._has_text = True
+
+    @property
+    def has_content(self):
+        """True once the open topic holds any non-whitespace text."""
+        return self._has_text
+
+    def snapshot(self):
+        """The open topic as a meta dict holding its content so far, or None.
+
+        start(snapshot) reopens it, e.g. when a checkpointed run resumes.
+        """
+        if self.meta is None:
+            return None
+        self._parts = ["".join(self._parts)]
+        return {**self.meta, "content": self._parts[0]}
+
+    def close(self):
+        if self.meta is None:
+            return
+        meta, parts = self.meta, self._parts
+        self.meta, self._parts, self._has_text = None, [], False
+        content = "".join(parts)
+        if len(content.strip()) > self.min_chars:
+            meta["content"] = content
+            self.on_close(meta)
+
+
+class TopicWriter:
+    """TopicBuilder sink: writes each closed topic to `<slug>.json` at once
+    and keeps only its index entry, output paths and size.
+
+    Topics are written as compact JSON. The viewer imports each file as
+    its own lazily loaded module, and the host compresses what it serves.
+    A topic whose slug is reserved (the index's own name) gets "-topic"
+    appended.
+    """
+
+    def __init__(self, output_dir, log=False):
+        self.output_dir = output_dir
+        self.log = log
+        self.entries = []
+        self.paths = []
+        self.bytes = 0
+
+    def __call__(self, topic):
+        if topic["slug"] in RESERVED_SLUGS:
+            topic = {**topic, "slug": f"{topic['slug']}-topic"}
+        out_path = os.path.join(self.output_dir, f"{topic['slug']}.json")
+        data = compact_json(topic)
+        with open(out_path, 'wb') as f:
+            f.write(data)
+        self.paths.append(out_path)
+        self.bytes += len(data)
+        self.entries.append(index_entry(topic))
+        if self.log:
+            print(f"   Saved: {topic['title']} -> {out_path}")
+
+    def state(self):
+        """What has been written so far, for a checkpoint; see resume()."""
+        return {"entries": self.entries, "paths": self.paths, "bytes": self.bytes}
+
+    def resume(self, state):
+        """Continues from a state()."""
+        self.entries = list(state["entries"])
+        self.paths = list(state["paths"])
+        self.bytes = state["bytes"]
@@ -0,0 +1,133 @@
+import os
+import json
+
+from search_index import SearchIndex, rebuild as rebuild_search
+
+INDEX_NAME = "index.json"
+# Slugs a topic file can't take, as <slug>.json would overwrite the index
+RESERVED_SLUGS = {INDEX_NAME[:-len('.json')]}
+
+
+def index_entry(topic, book=None):
+    """Listing-only summary of a topic; the content body stays in its own file."""
+    content = topic.get("content", "")
+    return {
+        "slug": topic["slug"],
+        "title": topic.get("title", topic["slug"]),
+        "description": topic.get("description", ""),
+        "tags": topic.get("tags", []),
+        "createdAt": topic.get("createdAt"),
+        "wordCount": len(content.split()),
+        "book": book,
+    }
+
+
+def read_topics(output_dir, entries):
+    """Full topic dicts for index `entries`, read back from their files."""
+    topics = []
+    for entry in entries:
+        try:
+            with open(os.path.join(output_dir, f"{entry['slug']}.json"), 'r', encoding='utf-8') as f:
+                topics.append({**json.load(f), "slug": entry["slug"]})
+        except (OSError, ValueError) as e:
+            print(f"Warning: cannot read topic {entry['slug']}: {e}")
+    return topics
+
+
+class TopicIndex:
+    """Compact index.json written beside the per-topic JSON files.
+
+    The listing pages load this few-KB manifest instead of every tutorial
+    body; entries are replaced per book so a partial rebuild keeps the
+    entries of books it did not touch. Unless `search` is False, the
+    full-text SearchIndex beside it is updated book by book alongside;
+    unless `dedupe` is False, so are the MinHash signatures that mark
+    near-duplicate topics with "duplicateOf" (the listings hide those).
+    """
+
+    def __init__(self, output_dir, search=True, dedupe=True):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, INDEX_NAME)
+        self.entries = {}
+        self.search = SearchIndex(output_dir) if search else None
+        self.duplicates = None
+        if dedupe:
+            # NumPy is only loaded once an index is actually built
+            from dedupe import DuplicateIndex, default_signatures_path
+
+            self.duplicates = DuplicateIndex(default_signatures_path(output_dir))
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for entry in json.load(f).get("topics", []):
+                    self.entries[entry["slug"]] = entry
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: rebuilding unreadable topic index {self.path}: {e}")
+
+    def replace_book(self, book, entries):
+        """Swaps in the index entries for one book (and any slugs it now owns)."""
+        self._drop(book)
+        for entry in entries:
+            self.entries[entry["slug"]] = {**entry, "book": book}
+        if self.search is None and self.duplicates is None:
+            return
+        topics = read_topics(self.output_dir, entries)
+        if self.search is not None:
+            self.search.replace_book(book, topics)
+        if self.duplicates is not None:
+            self.duplicates.replace_book(book, topics)
+
+    def drop_book(self, book):
+        self._drop(book)
+        if self.search is not None:
+            self.search.drop_book(book)
+        if self.duplicates is not None:
+            self.duplicates.drop_book(book)
+
+    def _drop(self, book):
+        self.entries = {s: e for s, e in self.entries.items() if e.get("book") != book}
+
+    def save(self):
+        if self.duplicates is not None:
+            links = self.duplicates.links()
+            for slug, entry in self.entries.items():
+                if slug in links:
+                    entry["duplicateOf"] = links[slug]
+                else:
+                    entry.pop("duplicateOf", None)
+            self.duplicates.save()
+        topics = sorted(self.entries.values(), key=lambda e: e["slug"])
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "topics": topics}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, self.path)
+        if self.search is not None:
+            self.search.save()
+
+
+def rebuild(output_dir):
+    """Re-indexes every topic file in `output_dir`, keeping known book owners."""
+    from dedupe import rebuild as rebuild_dedupe
+
+    index = TopicIndex(output_dir, search=False, dedupe=False)
+    owners = {s: e.get("book") for s, e in index.entries.items()}
+    index.entries = {}
+    for name in sorted(os.listdir(output_dir)):
+        if not name.endswith('.json') or name == INDEX_NAME:
+            continue
+        with open(os.path.join(output_dir, name), 'r', encoding='utf-8') as f:
+            topic = json.load(f)
+        if "slug" not in topic:
+            topic["slug"] = name[:-len('.json')]
+        index.entries[topic["slug"]] = index_entry(topic, owners.get(topic["slug"]))
+    index.duplicates = rebuild_dedupe(output_dir, index.entries.values())
+    index.save()
+    index.search = rebuild_search(output_dir, index.entries.values())
+    return index
+
+
+if __name__ == "__main__":
+    OUTPUT_DIR = os.path.join("src", "data", "generated_tutorials")
+    index = rebuild(OUTPUT_DIR)
+    print(f"Indexed {len(index.entries)} topics -> {index.path}")
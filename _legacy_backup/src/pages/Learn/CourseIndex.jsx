@@ -46,13 +46,13 @@ const CourseIndex = () => {
         // Load Generated Tutorials dynamically
         const loadTutorials = async () => {
             try {
-                // Vite specific glob import
-                const modules = import.meta.glob('../../data/generated_tutorials/*.json');
+                // Compact listing manifest written by the extractors
+                const { default: tutorialIndex } = await import('../../data/generated_tutorials/index.json');
                 const ai = [];
                 const premium = [];
-                for (const path in modules) {
-                    const mod = await modules[path]();
-                    const data = mod.default || mod;
+                for (const data of tutorialIndex.topics || []) {
+                    // Near-duplicates of another book's module are listed once, under the canonical slug
+                    if (data.duplicateOf) continue;
                     if (data.tags?.includes('Elite') || data.tags?.includes('Premium')) {
                         premium.push(data);
                     } else {
@@ -1,10 +1,13 @@
 import { client, urlFor } from '../lib/sanity';
+import { searchTutorials } from '../utils/tutorialSearch';
 
 const Notes = () => {
     const [notes, setNotes] = useState([]);
     const [loading, setLoading] = useState(true);
     const [searchTerm, setSearchTerm] = useState('');
     const [selectedTag, setSelectedTag] = useState('all');
+    // Slugs of generated tutorials whose body matches the search (prebuilt index)
+    const [contentMatches, setContentMatches] = useState(new Set());
 
     useEffect(() => {
         fetchNotes();
@@ -13,6 +16,18 @@ const Notes = () => {
         if (queryVal) setSearchTerm(queryVal);
     }, []);
 
+    useEffect(() => {
+        if (!searchTerm.trim()) {
+            setContentMatches(new Set());
+            return;
+        }
+        let stale = false;
+        searchTutorials(searchTerm, { limit: Infinity, requireAll: true })
+            .then((results) => !stale && setContentMatches(new Set(results.map((r) => r.slug))))
+            .catch((error) => console.error('Error searching tutorials:', error));
+        return () => { stale = true; };
+    }, [searchTerm]);
+
     const fetchNotes = async () => {
         try {
             // Fetch Firebase Notes
@@ -49,22 +64,18 @@ const Notes = () => {
                 type: item._type
             }));
 
-            // Fetch Generated Tutorials (JSON)
-            const tutorialModules = import.meta.glob('../data/generated_tutorials/*.json', { eager: true });
-            const generatedTutorials = Object.values(tutorialModules).map((module) => {
-                const data = module.default || module;
-                return {
-                    id: data.slug,
-                    title: data.title,
-                    description: data.description,
-                    content: data.content,
-                    tags: data.tags || [],
-                    slug: data.slug,
-                    category: 'Course Module',
-                    createdAt: new Date(data.createdAt || Date.now()),
-                    type: 'tutorial'
-                };
-            });
+            // Fetch Generated Tutorials (compact index; bodies load per slug in the viewer)
+            const { default: tutorialIndex } = await import('../data/generated_tutorials/index.json');
+            const generatedTutorials = (tutorialIndex.topics || []).filter((data) => !data.duplicateOf).map((data) => ({
+                id: data.slug,
+                title: data.title,
+                description: data.description,
+                tags: data.tags || [],
+                slug: data.slug,
+                category: 'Course Module',
+                createdAt: new Date(data.createdAt || Date.now()),
+                type: 'tutorial'
+            }));
 
             // Merge and Sort
             const allContent = [...formattedSanity, ...firebaseNotes, ...generatedTutorials].sort((a, b) => b.createdAt - a.createdAt);
@@ -86,7 +97,7 @@ const Notes = () => {
             note.title.toLowerCase().includes(word) ||
             note.description.toLowerCase().includes(word) ||
             note.content?.toLowerCase().includes(word)
-        );
+        ) || (note.type === 'tutorial' && contentMatches.has(note.slug));
         const matchesTag = selectedTag === 'all' || note.tags?.includes(selectedTag);
         return matchesSearch && matchesTag;
     });
@@ -0,0 +1,45 @@
+import { describe, it, expect } from 'vitest';
+import { createSearch, indexTerm, shardKey, stem, tokens } from '../utils/tutorialSearch';
+
+// Must tokenize exactly like scripts/search_index.py, or shard lookups miss
+describe('Tutorial search tokenizer', () => {
+    it('stems the way the index builder does', () => {
+        expect(stem('running')).toBe('run');
+        expect(stem('stopped')).toBe('stop');
+        expect(stem('dictionaries')).toBe('dictionary');
+        expect(stem('process')).toBe('process');
+        expect(stem('x86')).toBe('x86');
+    });
+
+    it('drops stop words, single letters and link noise', () => {
+        expect(tokens('See ![cpu](img/a.png) at https://x.org, the CPU_cache')).toEqual(['see', 'at', 'the', 'cpu', 'cache']);
+        expect(['the', 'a', '7', 'über'].map(indexTerm)).toEqual([null, null, '7', 'über']);
+        expect(shardKey('über')).toBe('_');
+        expect(shardKey('cache')).toBe('ca');
+    });
+});
+
+describe('Tutorial search', () => {
+    const files = {
+        manifest: {
+            version: 1, prefix: 2, books: {},
+            docs: { a: { title: 'Caches', book: '', length: 6 }, b: { title: 'Memory', book: 'm.pdf', length: 6 } },
+        },
+        // [field mask, position deltas...]
+        ca: { cache: { a: [1, 0, 3], b: [0, 3] } },
+        me: { memory: { a: [0, 4], b: [1, 0, 2] } },
+    };
+    const { search } = createSearch((name) => files[name] || null);
+
+    it('ranks title matches first', async () => {
+        const results = await search('cache');
+        expect(results.map((r) => r.slug)).toEqual(['a', 'b']);
+        expect(results[1].book).toBe('m.pdf');
+    });
+
+    it('requires every word or phrase when asked', async () => {
+        expect((await search('memory cache', { requireAll: true })).length).toBe(2);
+        expect((await search('"memory cache"')).map((r) => r.slug)).toEqual(['b']);
+        expect(await search('nothing here')).toEqual([]);
+    });
+});
@@ -0,0 +1,153 @@
+/**
+ * Client for the prebuilt full-text index of the generated tutorials
+ * (scripts/search_index.py). Tokenizing and stemming mirror the Python
+ * side exactly; shards are loaded lazily, one per term prefix.
+ */
+
+const shardFiles = import.meta.glob('../data/generated_tutorials/search/*.json', { import: 'default' });
+const SEARCH_PATH = '../data/generated_tutorials/search/';
+
+const SEARCH_VERSION = 1;
+const SHARD_PREFIX = 2;
+
+// Bits of a posting's field mask
+const TITLE = 1;
+const HEADING = 2;
+const FIELD_BOOST = [[TITLE, 3.0], [HEADING, 1.5]];
+
+const TOKEN_RE = /[\p{L}\p{N}]+/gu;
+const NOISE_RE = /!\[[^\]]*\]\([^)]*\)|https?:\/\/\S+/g;
+const PHRASE_RE = /"([^"]+)"/g;
+
+const STOPWORDS = new Set(`
+a an and are as at be but by for from has have if in into is it its of on or
+that the their then there these this to was were will with
+`.split(/\s+/).filter(Boolean));
+
+// Longest first; [suffix, replacement, minimum stem length left]
+const SUFFIXES = [
+    ['ational', 'ate', 2], ['ization', 'ize', 2], ['fulness', 'ful', 2], ['iveness', 'ive', 2],
+    ['ousness', 'ous', 2], ['tional', 'tion', 2], ['ements', '', 3], ['ement', '', 3],
+    ['ments', '', 3], ['ment', '', 3], ['ness', '', 3], ['ing', '', 3], ['ies', 'y', 2],
+    ['ied', 'y', 2], ['ed', '', 3], ['ly', '', 3], ['es', '', 3], ['s', '', 3],
+];
+
+export const stem = (word) => {
+    if (word.length <= 3 || !/^\p{L}+$/u.test(word)) return word;
+    if (word.endsWith('ss') || word.endsWith('us') || word.endsWith('is')) return word;
+    for (const [suffix, replacement, minStem] of SUFFIXES) {
+        if (word.endsWith(suffix) && word.length - suffix.length >= minStem) {
+            word = word.slice(0, -suffix.length) + replacement;
+            if ((suffix === 'ing' || suffix === 'ed') && word.length > 3 &&
+                word.at(-1) === word.at(-2) && !'lsz'.includes(word.at(-1))) {
+                word = word.slice(0, -1); // running -> run, stopped -> stop
+            }
+            break;
+        }
+    }
+    return word;
+};
+
+export const tokens = (text) => text.replace(NOISE_RE, ' ').toLowerCase().match(TOKEN_RE) || [];
+
+export const indexTerm = (token) => {
+    if (STOPWORDS.has(token) || (token.length < 2 && !/^\p{Nd}$/u.test(token))) return null;
+    return stem(token);
+};
+
+export const shardKey = (term) => {
+    const key = term.slice(0, SHARD_PREFIX);
+    return /^[A-Za-z0-9]+$/.test(key) ? key : '_';
+};
+
+const undelta = (deltas) => {
+    let pos = 0;
+    return deltas.map((d) => (pos += d));
+};
+
+/**
+ * Search over an index whose files are read with `load(name)` (a shard
+ * key or "manifest"; resolves to the parsed JSON, or null when missing).
+ */
+export const createSearch = (load) => {
+    const cache = new Map();
+    const file = (name) => {
+        if (!cache.has(name)) cache.set(name, Promise.resolve(load(name)).then((data) => data || {}));
+        return cache.get(name);
+    };
+
+    const manifest = async () => {
+        const data = await file('manifest');
+        return data.version === SEARCH_VERSION && data.prefix === SHARD_PREFIX ? data : { docs: {} };
+    };
+
+    const postings = async (term) => {
+        const raw = (await file(shardKey(term)))[term] || {};
+        return Object.fromEntries(Object.entries(raw).map(([slug, p]) => [slug, [p[0], undelta(p.slice(1))]]));
+    };
+
+    const phraseDocs = (phrase, lists) => {
+        const parts = phrase.map((t, offset) => [offset, indexTerm(t)]).filter(([, t]) => t !== null);
+        if (!parts.length) return null;
+        const [[firstOffset, firstTerm], ...rest] = parts;
+        const found = new Set();
+        for (const [slug, [, positions]] of Object.entries(lists[firstTerm])) {
+            const others = rest.map(([offset, t]) => [offset - firstOffset, lists[t][slug]]);
+            if (others.some(([, entry]) => !entry)) continue;
+            const sets = others.map(([delta, entry]) => [delta, new Set(entry[1])]);
+            if (positions.some((p) => sets.every(([delta, pos]) => pos.has(p + delta)))) found.add(slug);
+        }
+        return found;
+    };
+
+    /**
+     * Ranked topics for `query` as [{ slug, title, book, score }], best
+     * first: BM25, boosted where a word occurs in a title or heading. A
+     * "quoted phrase" only matches topics holding its words in order; with
+     * `requireAll`, every word of the query must occur in the topic.
+     */
+    const search = async (query, { limit = 10, requireAll = false } = {}) => {
+        const phrases = [...query.matchAll(PHRASE_RE)].map((m) => tokens(m[1]));
+        const words = [...new Set(tokens(query).map(indexTerm).filter((t) => t !== null))];
+        const { docs } = await manifest();
+        const n = Object.keys(docs).length;
+        if (!words.length || !n) return [];
+
+        const phraseTerms = phrases.flat().map(indexTerm).filter((t) => t !== null);
+        const terms = [...new Set([...words, ...phraseTerms])];
+        const lists = Object.fromEntries(await Promise.all(terms.map(async (t) => [t, await postings(t)])));
+        const avgLen = Object.values(docs).reduce((sum, d) => sum + d.length, 0) / n;
+
+        let scores = new Map();
+        for (const term of words) {
+            const matches = Object.entries(lists[term]);
+            const idf = Math.log(1 + (n - matches.length + 0.5) / (matches.length + 0.5));
+            for (const [slug, [mask, positions]] of matches) {
+                const tf = positions.length;
+                const norm = 1.2 * (0.25 + 0.75 * docs[slug].length / avgLen);
+                const boost = 1 + FIELD_BOOST.reduce((b, [bit, value]) => (mask & bit ? b + value : b), 0);
+                scores.set(slug, (scores.get(slug) || 0) + idf * tf * 2.2 / (tf + norm) * boost);
+            }
+        }
+        if (requireAll) {
+            scores = new Map([...scores].filter(([slug]) => words.every((t) => lists[t][slug])));
+        }
+        for (const phrase of phrases) {
+            const matched = phraseDocs(phrase, lists);
+            if (matched) scores = new Map([...scores].filter(([slug]) => matched.has(slug)));
+        }
+        return [...scores]
+            .sort((a, b) => b[1] - a[1])
+            .slice(0, limit)
+            .map(([slug, score]) => ({ slug, title: docs[slug].title, book: docs[slug].book || null, score }));
+    };
+
+    return { search };
+};
+
+const bundled = createSearch((name) => {
+    const loader = shardFiles[`${SEARCH_PATH}${name}.json`];
+    return loader ? loader() : null;
+});
+
+export const searchTutorials = bundled.search;